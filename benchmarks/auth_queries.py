@@ -0,0 +1,69 @@
+"""Число запросов к БД на каждый URL notes.urls до и после кеша авторизации.
+
+Запуск из корня проекта:
+
+    python -m benchmarks.auth_queries
+"""
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yanote.settings')
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    CaptureQueriesContext, setup_test_environment,
+)
+from django.urls import reverse  # noqa: E402
+
+from notes import urls as notes_urls  # noqa: E402
+from notes.models import Note  # noqa: E402
+
+DEFAULT_AUTH = {
+    'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+    'MIDDLEWARE': [
+        'django.contrib.auth.middleware.AuthenticationMiddleware'
+        if name == 'notes.middleware.CachedAuthenticationMiddleware'
+        else name
+        for name in settings.MIDDLEWARE
+    ],
+}
+
+
+def count_queries(user, url):
+    cache.clear()
+    client = Client()
+    client.force_login(user)
+    client.get(url)
+    with CaptureQueriesContext(connection) as context:
+        client.get(url)
+    return len(context.captured_queries)
+
+
+def main():
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        user = get_user_model().objects.create(username='bench')
+        note = Note.objects.create(title='Заметка', text='Текст', author=user)
+        print(f'{"URL":<28}{"было":>6}{"стало":>7}')
+        for pattern in notes_urls.urlpatterns:
+            values = {'slug': note.slug, 'number': 1}
+            url = reverse(f'notes:{pattern.name}', kwargs={
+                name: values[name] for name in pattern.pattern.converters
+            })
+            with override_settings(**DEFAULT_AUTH):
+                before = count_queries(user, url)
+            after = count_queries(user, url)
+            print(f'{url:<28}{before:>6}{after:>7}')
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Размер базы и чтение с диска с хранением текстов в сжатом виде и без.
+
+В двух временных базах создаются одинаковые заметки с текстами-логами
+(средний размер --size КБ). Для каждой базы печатаются размер файла,
+время и объём чтения (rchar из /proc/self/io) для списка заметок и для
+страницы заметки:
+
+    python -m benchmarks.compression --notes 200 --size 256
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yanote.settings')
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+from notes.models import Note  # noqa: E402
+
+LEVELS = ('DEBUG', 'INFO', 'INFO', 'INFO', 'WARNING', 'ERROR')
+PATHS = ('/notes/', '/note/{}/', '/edit/{}/', '/api/notes/', '/search/')
+
+
+def log_text(rng, size):
+    """Текст размером около size байт в формате журнала веб-сервера."""
+    lines = []
+    total = 0
+    while total < size:
+        line = (
+            f'2026-10-18 12:{rng.randrange(60):02}:{rng.randrange(60):02}.'
+            f'{rng.randrange(1000):03} {rng.choice(LEVELS)} '
+            f'worker-{rng.randrange(8)} request_id={rng.getrandbits(64):x} '
+            f'path={rng.choice(PATHS).format(rng.randrange(10 ** 6))} '
+            f'status={rng.choice((200, 200, 302, 404, 500))} '
+            f'duration={rng.randrange(1, 900)}ms'
+        )
+        lines.append(line)
+        total += len(line) + 1
+    return '\n'.join(lines)
+
+
+def read_bytes():
+    """Байты, прочитанные процессом через read(); None вне Linux."""
+    try:
+        with open('/proc/self/io') as stats:
+            for line in stats:
+                if line.startswith('rchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+
+
+def measure(action):
+    # Новое соединение: страницы не берутся из кеша SQLite.
+    connection.close()
+    before = read_bytes()
+    started = time.perf_counter()
+    action()
+    elapsed = time.perf_counter() - started
+    after = read_bytes()
+    return elapsed, None if before is None else after - before
+
+
+def run(notes, size, seed):
+    rng = random.Random(seed)
+    user = get_user_model().objects.create(username='bench')
+    Note.objects.bulk_create(
+        Note(
+            title=f'Журнал {number}',
+            text=log_text(rng, int(rng.lognormvariate(0, 0.5) * size)),
+            slug=f'log-{number}',
+            author=user,
+        )
+        for number in range(notes)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute('VACUUM')
+    slugs = [f'log-{number}' for number in range(0, notes, 10)]
+    return {
+        'file': os.path.getsize(connection.settings_dict['NAME']),
+        'list': measure(lambda: list(
+            Note.objects.filter(author=user).only('id', 'slug', 'title')
+        )),
+        'detail': measure(lambda: [
+            len(Note.objects.get(slug=slug).text) for slug in slugs
+        ]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--notes', type=int, default=200)
+    parser.add_argument(
+        '--size', type=int, default=256, help='Средний размер текста, КБ.'
+    )
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    results = {}
+    for name, threshold in (
+        ('без сжатия', None),
+        ('сжатие', settings.NOTES_TEXT_COMPRESS_THRESHOLD),
+    ):
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            NOTES_TEXT_COMPRESS_THRESHOLD=threshold
+        ):
+            connection.settings_dict['TEST']['NAME'] = os.path.join(
+                directory, 'bench.sqlite3'
+            )
+            old_name = connection.creation.create_test_db(verbosity=0)
+            try:
+                results[name] = run(args.notes, args.size * 1024, args.seed)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    mb = 1024 * 1024
+    print(f'{"":<12}{"файл МБ":>9}{"список мс":>11}{"список МБ":>11}'
+          f'{"заметки мс":>12}{"заметки МБ":>12}')
+    for name, data in results.items():
+        list_time, list_bytes = data['list']
+        detail_time, detail_bytes = data['detail']
+        print(
+            f'{name:<12}{data["file"] / mb:>9.1f}'
+            f'{list_time * 1000:>11.1f}{(list_bytes or 0) / mb:>11.1f}'
+            f'{detail_time * 1000:>12.1f}{(detail_bytes or 0) / mb:>12.1f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Размер ответов списка и страницы заметки до и после сжатия.
+
+Страницы notes:list и notes:detail запрашиваются с обычными загрузчиками
+шаблонов, с загрузчиками notes.loaders и с ними же и gzip:
+
+    python -m benchmarks.response_size --notes 50
+"""
+import argparse
+import copy
+import os
+import tempfile
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yanote.settings')
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+from notes.models import Note  # noqa: E402
+from notes.seed import NoteGenerator, seed_notes  # noqa: E402
+
+PLAIN_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+def plain_templates():
+    templates = copy.deepcopy(settings.TEMPLATES)
+    templates[0]['OPTIONS']['loaders'] = PLAIN_LOADERS
+    return templates
+
+
+def sizes(client, urls, encoding):
+    """Байт в ответе на каждый URL, как они уходят клиенту."""
+    result = {}
+    for name, url in urls.items():
+        response = client.get(url, HTTP_ACCEPT_ENCODING=encoding)
+        result[name] = len(response.content)
+    return result
+
+
+def run(notes):
+    user = get_user_model().objects.create(username='bench')
+    seed_notes([user], notes, NoteGenerator())
+    note = Note.objects.filter(author=user).order_by('id').first()
+    client = Client()
+    client.force_login(user)
+    urls = {
+        'NotesList': reverse('notes:list'),
+        'NoteDetail': reverse('notes:detail', args=(note.slug,)),
+    }
+    results = {}
+    with override_settings(TEMPLATES=plain_templates()):
+        results['исходные шаблоны'] = sizes(client, urls, '')
+    results['без отступов'] = sizes(client, urls, '')
+    results['без отступов + gzip'] = sizes(client, urls, 'gzip')
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--notes', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    with tempfile.TemporaryDirectory() as directory:
+        connection.settings_dict['TEST']['NAME'] = os.path.join(
+            directory, 'bench.sqlite3'
+        )
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            results = run(args.notes)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    base = results['исходные шаблоны']
+    print(f'{"":<22}{"NotesList":>16}{"NoteDetail":>16}')
+    for name, data in results.items():
+        print(f'{name:<22}' + ''.join(
+            f'{data[page]:>8} {data[page] / base[page]:>6.0%}'
+            for page in ('NotesList', 'NoteDetail')
+        ))
+
+
+if __name__ == '__main__':
+    main()
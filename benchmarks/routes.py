@@ -0,0 +1,325 @@
+"""Нагрузочный прогон всех маршрутов через WSGI-обработчик в процессе.
+
+Для каждого размера данных создаётся пользователь с заданным числом
+заметок, затем каждый маршрут notes/urls.py и yanote/urls.py вызывается
+--requests раз. Результаты (p50/p95/p99, запросов в секунду, запросов
+к БД на ответ, пиковый RSS) сохраняются в JSON и сравниваются с базовыми:
+
+    python -m benchmarks.routes --sizes 10,10000,1000000
+    python -m benchmarks.routes --save-baseline
+
+Регрессия - рост p95 больше чем на --tolerance или рост числа запросов
+к БД; при ней скрипт завершается с кодом 1.
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from importlib import import_module
+from pathlib import Path
+from urllib.parse import urlencode
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yanote.settings')
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib import auth  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.core.handlers.wsgi import WSGIHandler  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+from notes.metrics import QueryCounter  # noqa: E402
+from notes.models import Note  # noqa: E402
+from notes.revisions import record_revision  # noqa: E402
+from notes.seed import NoteGenerator, seed_notes  # noqa: E402
+
+User = get_user_model()
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+CSRF_TOKEN = 'b' * 32
+
+
+def session_cookie(user):
+    engine = import_module(settings.SESSION_ENGINE)
+    session = engine.SessionStore()
+    session[auth.SESSION_KEY] = str(user.pk)
+    session[auth.BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[auth.HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+
+class Driver:
+    """Вызывает WSGIHandler напрямую и замеряет каждый ответ."""
+
+    def __init__(self):
+        self.handler = WSGIHandler()
+
+    def environ(self, method, path, query, body, cookie, content_type):
+        cookies = f'{settings.CSRF_COOKIE_NAME}={CSRF_TOKEN}'
+        if cookie:
+            cookies = f'{cookies}; {cookie}'
+        return {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'SERVER_NAME': 'testserver',
+            'SERVER_PORT': '80',
+            'HTTP_HOST': 'testserver',
+            'REMOTE_ADDR': '127.0.0.1',
+            'HTTP_COOKIE': cookies,
+            'HTTP_X_CSRFTOKEN': CSRF_TOKEN,
+            'CONTENT_TYPE': content_type,
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.url_scheme': 'http',
+            'wsgi.version': (1, 0),
+            'wsgi.multithread': False,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+
+    def request(self, method, path, query='', body=b'', cookie='',
+                content_type='application/x-www-form-urlencoded'):
+        status = []
+        counter = QueryCounter()
+        environ = self.environ(
+            method, path, query, body, cookie, content_type
+        )
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            result = self.handler(
+                environ, lambda code, headers, *args: status.append(code)
+            )
+            try:
+                for _ in result:
+                    pass
+            finally:
+                result.close()
+        return (
+            time.perf_counter() - started,
+            counter.count,
+            int(status[0].split()[0]),
+        )
+
+
+def scenarios(user, note):
+    """Маршруты: (имя, метод, путь, query, тело, нужен ли вход)."""
+    slug = (note.slug,)
+    form = f'title=Bench&text=Body&slug={note.slug}'.encode()
+    api_body = json.dumps({'update': [
+        {'slug': note.slug, 'changes': {'text': 'Body'}}
+    ]}).encode()
+    yield 'notes:home', 'GET', reverse('notes:home'), '', b'', True
+    yield 'notes:add', 'GET', reverse('notes:add'), '', b'', True
+    yield 'notes:add', 'POST', reverse('notes:add'), '', (
+        b'title=Bench&text=Body'
+    ), True
+    yield 'notes:edit', 'GET', reverse('notes:edit', args=slug), '', b'', True
+    yield 'notes:edit', 'POST', reverse(
+        'notes:edit', args=slug
+    ), '', form, True
+    yield 'notes:detail', 'GET', reverse(
+        'notes:detail', args=slug
+    ), '', b'', True
+    yield 'notes:revisions', 'GET', reverse(
+        'notes:revisions', args=slug
+    ), '', b'', True
+    yield 'notes:revision', 'GET', reverse(
+        'notes:revision', args=(note.slug, 1)
+    ), '', b'', True
+    yield 'notes:delete', 'GET', reverse(
+        'notes:delete', args=slug
+    ), '', b'', True
+    yield 'notes:list', 'GET', reverse('notes:list'), '', b'', True
+    yield 'notes:trash', 'GET', reverse('notes:trash'), '', b'', True
+    yield 'notes:search', 'GET', reverse('notes:search'), urlencode(
+        {'q': 'молоко'}
+    ), b'', True
+    yield 'notes:export', 'GET', reverse('notes:export'), '', b'', True
+    yield 'notes:success', 'GET', reverse('notes:success'), '', b'', True
+    yield 'notes:api_list', 'GET', reverse('notes:api_list'), '', b'', True
+    yield 'notes:api_detail', 'GET', reverse(
+        'notes:api_detail', args=slug
+    ), '', b'', True
+    yield 'notes:api_batch', 'POST', reverse(
+        'notes:api_batch'
+    ), '', api_body, True
+    yield 'users:login', 'GET', reverse('users:login'), '', b'', False
+    yield 'users:signup', 'GET', reverse('users:signup'), '', b'', False
+    yield 'users:logout', 'GET', reverse('users:logout'), '', b'', False
+    yield 'admin:index', 'GET', reverse('admin:index'), '', b'', True
+    yield 'metrics', 'GET', reverse('metrics'), '', b'', False
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def measure(driver, user, note, requests, warmup):
+    cookie = session_cookie(user)
+    results = {}
+    for name, method, path, query, body, login in scenarios(user, note):
+        content_type = (
+            'application/json' if name == 'notes:api_batch'
+            else 'application/x-www-form-urlencoded'
+        )
+        call = (method, path, query, body, cookie if login else '',
+                content_type)
+        for _ in range(warmup):
+            driver.request(*call)
+        timings, queries, statuses = [], [], set()
+        started = time.perf_counter()
+        for _ in range(requests):
+            duration, count, status = driver.request(*call)
+            timings.append(duration)
+            queries.append(count)
+            statuses.add(status)
+        elapsed = time.perf_counter() - started
+        results[f'{method} {name}'] = {
+            'p50': percentile(timings, 0.50),
+            'p95': percentile(timings, 0.95),
+            'p99': percentile(timings, 0.99),
+            'rps': requests / elapsed,
+            'queries': statistics.mean(queries),
+            'statuses': sorted(statuses),
+        }
+    return results
+
+
+def run(sizes, requests, warmup):
+    driver = Driver()
+    generator = NoteGenerator()
+    report = {'sizes': {}}
+    for size in sizes:
+        # Суперпользователь: иначе admin:index отдаёт 302 на вход, а не
+        # страницу со списком моделей.
+        user = User.objects.create(
+            username=f'bench-{size}', is_staff=True, is_superuser=True
+        )
+        started = time.perf_counter()
+        seed_notes([user], size, generator)
+        note = Note.objects.filter(author=user).order_by('id').first()
+        # Версии пишет run_workers, поэтому первая создаётся заранее.
+        record_revision(note.pk, note.title, note.text)
+        seconds = time.perf_counter() - started
+        print(f'{size} заметок созданы за {seconds:.1f} с')
+        report['sizes'][str(size)] = measure(
+            driver, user, note, requests, warmup
+        )
+    report['peak_rss_kb'] = resource.getrusage(
+        resource.RUSAGE_SELF
+    ).ru_maxrss
+    return report
+
+
+def print_report(report):
+    for size, routes in report['sizes'].items():
+        print(f'\n{size} заметок')
+        print(f'{"маршрут":<26}{"p50 мс":>9}{"p95 мс":>9}{"p99 мс":>9}'
+              f'{"зап/с":>9}{"SQL":>6}  статусы')
+        for route, data in routes.items():
+            print(
+                f'{route:<26}{data["p50"] * 1000:>9.2f}'
+                f'{data["p95"] * 1000:>9.2f}{data["p99"] * 1000:>9.2f}'
+                f'{data["rps"]:>9.0f}{data["queries"]:>6.1f}  '
+                f'{",".join(map(str, data["statuses"]))}'
+            )
+    print(f'\nПиковый RSS: {report["peak_rss_kb"] / 1024:.0f} МБ')
+
+
+def compare(report, baseline, tolerance):
+    """Список регрессий относительно базового прогона."""
+    regressions = []
+    for size, routes in report['sizes'].items():
+        for route, data in routes.items():
+            base = baseline.get('sizes', {}).get(size, {}).get(route)
+            if base is None:
+                continue
+            if data['p95'] > base['p95'] * (1 + tolerance):
+                regressions.append(
+                    f'{size} {route}: p95 {base["p95"] * 1000:.2f} -> '
+                    f'{data["p95"] * 1000:.2f} мс'
+                )
+            if data['queries'] > base['queries']:
+                regressions.append(
+                    f'{size} {route}: запросов к БД {base["queries"]:.1f} -> '
+                    f'{data["queries"]:.1f}'
+                )
+            if any(status >= 500 for status in data['statuses']):
+                regressions.append(f'{size} {route}: ответ 5xx')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10,10000,1000000')
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument(
+        '--output', type=Path, default=RESULTS_DIR / 'latest.json'
+    )
+    parser.add_argument(
+        '--baseline', type=Path, default=RESULTS_DIR / 'baseline.json'
+    )
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument(
+        '--save-baseline', action='store_true',
+        help='Сохранить результаты как новые базовые.',
+    )
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    setup_test_environment()
+    # Размеры прогона больше квот и лимитов записи по умолчанию: запись
+    # должна измеряться, а не отклоняться.
+    with tempfile.TemporaryDirectory() as directory, override_settings(
+        NOTES_QUOTA_NOTES=None, NOTES_QUOTA_BYTES=None,
+        NOTES_THROTTLE_USER=None, NOTES_THROTTLE_IP=None,
+        NOTES_THROTTLE_MAX_WRITERS=None,
+    ):
+        connection.settings_dict['TEST']['NAME'] = os.path.join(
+            directory, 'bench.sqlite3'
+        )
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            report = run(sizes, args.requests, args.warmup)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    print_report(report)
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, indent=2), encoding='utf-8')
+    if args.save_baseline:
+        args.baseline.write_text(
+            json.dumps(report, indent=2), encoding='utf-8'
+        )
+        return
+    if not args.baseline.exists():
+        print(f'Базовых результатов нет: {args.baseline}')
+        return
+    regressions = compare(
+        report, json.loads(args.baseline.read_text(encoding='utf-8')),
+        args.tolerance,
+    )
+    if regressions:
+        print('\nРЕГРЕССИИ:', *regressions, sep='\n  ')
+        sys.exit(1)
+    print('\nРегрессий нет.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Пропускная способность читателей и писателей SQLite до и после настройки.
+
+Запуск из корня проекта:
+
+    python -m benchmarks.sqlite_concurrency --readers 4 --writers 2
+
+Профиль "default" повторяет поведение Django по умолчанию: новое
+соединение на каждый запрос, журнал отката и synchronous=FULL.
+Профиль "tuned" держит соединение открытым и применяет TUNED_PRAGMAS.
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+from notes.db import TUNED_PRAGMAS
+
+SCHEMA = (
+    'CREATE TABLE note (id INTEGER PRIMARY KEY, title TEXT, text TEXT, '
+    'author_id INTEGER)',
+    'CREATE INDEX note_author_id_idx ON note (author_id, id)',
+)
+AUTHORS = 10
+READ_SQL = (
+    'SELECT id, title FROM note WHERE author_id = ? '
+    'ORDER BY id DESC LIMIT 50'
+)
+WRITE_SQL = 'INSERT INTO note (title, text, author_id) VALUES (?, ?, ?)'
+
+
+def connect(path, profile):
+    connection = sqlite3.connect(path, timeout=5, isolation_level=None)
+    if profile == 'tuned':
+        for name, value in TUNED_PRAGMAS.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+    return connection
+
+
+def prepare(path, profile, rows):
+    connection = connect(path, profile)
+    for statement in SCHEMA:
+        connection.execute(statement)
+    connection.execute('BEGIN')
+    connection.executemany(
+        WRITE_SQL,
+        (('Заголовок', 'Текст ' * 50, i % AUTHORS) for i in range(rows)),
+    )
+    connection.execute('COMMIT')
+    connection.close()
+
+
+def worker(path, profile, role, duration, results):
+    operations = errors = 0
+    persistent = connect(path, profile) if profile == 'tuned' else None
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        connection = persistent or connect(path, profile)
+        try:
+            if role == 'reader':
+                connection.execute(
+                    READ_SQL, (operations % AUTHORS,)
+                ).fetchall()
+            else:
+                connection.execute('BEGIN IMMEDIATE')
+                connection.execute(
+                    WRITE_SQL, ('Заголовок', 'Текст ' * 50,
+                                operations % AUTHORS)
+                )
+                connection.execute('COMMIT')
+            operations += 1
+        except sqlite3.OperationalError:
+            errors += 1
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+        finally:
+            if persistent is None:
+                connection.close()
+    results.put((role, operations, errors))
+
+
+def run(profile, readers, writers, duration, rows):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.sqlite3')
+        prepare(path, profile, rows)
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=worker, args=(path, profile, role, duration, results)
+            )
+            for role in ['reader'] * readers + ['writer'] * writers
+        ]
+        for process in processes:
+            process.start()
+        totals = {'reader': [0, 0], 'writer': [0, 0]}
+        for _ in processes:
+            role, operations, errors = results.get()
+            totals[role][0] += operations
+            totals[role][1] += errors
+        for process in processes:
+            process.join()
+    for role, (operations, errors) in totals.items():
+        print(
+            f'{profile:>8} {role:>7}: {operations / duration:10.0f} оп/с, '
+            f'ошибок "database is locked": {errors}'
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--rows', type=int, default=100_000)
+    args = parser.parse_args()
+    for profile in ('default', 'tuned'):
+        run(profile, args.readers, args.writers, args.duration, args.rows)
+
+
+if __name__ == '__main__':
+    main()
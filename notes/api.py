@@ -0,0 +1,230 @@
+import json
+
+from django.conf import settings
+from django.db import transaction
+from django.forms.models import model_to_dict
+from django.http import HttpResponse, JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import generic
+from django.views.decorators.csrf import csrf_exempt
+
+from .forms import NoteForm
+from .models import NoteStats, text_size
+from .pagination import KeysetPaginator
+from .revisions import schedule_revision
+from .views import NoteBase
+
+SUMMARY_FIELDS = ('id', 'slug', 'title')
+
+
+class ApiError(Exception):
+
+    def __init__(self, status, errors):
+        super().__init__(errors)
+        self.status = status
+        self.errors = errors
+
+
+def serialize(note, summary=False):
+    data = {'id': note.id, 'slug': note.slug, 'title': note.title}
+    if not summary:
+        data.update(text=note.text, updated_at=note.updated_at.isoformat())
+    return data
+
+
+def form_errors(form):
+    return {field: list(errors) for field, errors in form.errors.items()}
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class NoteApiBase(NoteBase, generic.View):
+    """Общая часть JSON API: авторизация, разбор тела и ошибки.
+
+    Вместо CSRF-токена записи требуют Content-Type application/json:
+    браузер не отправит такой запрос на чужой сайт без CORS.
+    """
+
+    def handle_no_permission(self):
+        return JsonResponse(
+            {'errors': {'auth': ['Требуется авторизация.']}}, status=401
+        )
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except ApiError as error:
+            return JsonResponse({'errors': error.errors}, status=error.status)
+
+    def get_payload(self):
+        if self.request.content_type != 'application/json':
+            raise ApiError(
+                415, {'body': ['Ожидается Content-Type application/json.']}
+            )
+        try:
+            return json.loads(self.request.body)
+        except ValueError:
+            raise ApiError(400, {'body': ['Некорректный JSON.']})
+
+    def get_note(self, slug):
+        note = self.get_queryset().filter(slug=slug).first()
+        if note is None:
+            raise ApiError(404, {'slug': [f'Заметка {slug} не найдена.']})
+        return note
+
+    def save_form(self, data, note=None, partial=False):
+        """Проверяет данные формой NoteForm и сохраняет заметку."""
+        if not isinstance(data, dict):
+            raise ApiError(400, {'body': ['Ожидается объект заметки.']})
+        previous = None if note is None else (note.title, note.text)
+        if note is not None and partial:
+            data = {
+                **model_to_dict(note, NoteForm.Meta.fields),
+                'tags': ', '.join(note.tag_names()),
+                **data,
+            }
+        form = NoteForm(data=data, instance=note)
+        if not form.is_valid():
+            raise ApiError(400, form_errors(form))
+        note = form.save(commit=False)
+        error = NoteStats.objects.quota_error(
+            self.request.user.pk,
+            count=int(previous is None),
+            size=text_size(note.text) - note.size,
+        )
+        if error:
+            raise ApiError(403, {'quota': [error]})
+        note.author = self.request.user
+        note.save()
+        form.save_tags()
+        if previous is not None and previous != (note.title, note.text):
+            schedule_revision(note, previous)
+        return note
+
+
+class NoteListApi(NoteApiBase):
+    """GET - список заметок по курсору after, POST - новая заметка."""
+
+    def get(self, request, *args, **kwargs):
+        paginator = KeysetPaginator(
+            self.get_queryset().only(*SUMMARY_FIELDS),
+            settings.NOTES_API_PAGE_SIZE,
+        )
+        page = paginator.get_page(
+            after=paginator.parse_cursor(request.GET.get('after'))
+        )
+        return JsonResponse({
+            'results': [
+                serialize(note, summary=True) for note in page.object_list
+            ],
+            'next': page.next_cursor,
+        })
+
+    def post(self, request, *args, **kwargs):
+        note = self.save_form(self.get_payload())
+        return JsonResponse(serialize(note), status=201)
+
+
+class NoteDetailApi(NoteApiBase):
+    """Чтение, изменение и удаление одной заметки по slug."""
+
+    def get(self, request, slug):
+        return JsonResponse(serialize(self.get_note(slug)))
+
+    def put(self, request, slug):
+        note = self.save_form(self.get_payload(), self.get_note(slug))
+        return JsonResponse(serialize(note))
+
+    def patch(self, request, slug):
+        note = self.save_form(
+            self.get_payload(), self.get_note(slug), partial=True
+        )
+        return JsonResponse(serialize(note))
+
+    def delete(self, request, slug):
+        # Как и в HTML-интерфейсе, заметка уходит в корзину.
+        note = self.get_note(slug)
+        self.get_queryset().filter(pk=note.pk).trash()
+        return HttpResponse(status=204)
+
+
+class NoteBatchApi(NoteApiBase):
+    """Пакет операций create, update, delete в одной транзакции.
+
+    Если хотя бы одна операция не прошла проверку, не применяется ничего,
+    а в ответе перечислены ошибки по индексам операций.
+    """
+
+    def post(self, request, *args, **kwargs):
+        payload = self.get_payload()
+        if not isinstance(payload, dict):
+            raise ApiError(400, {'body': ['Ожидается объект с операциями.']})
+        creates = payload.get('create', [])
+        updates = payload.get('update', [])
+        deletes = payload.get('delete', [])
+        if not all(isinstance(ops, list)
+                   for ops in (creates, updates, deletes)):
+            raise ApiError(400, {'body': ['Операции передаются списками.']})
+        if not all(isinstance(slug, str) for slug in deletes):
+            raise ApiError(400, {'delete': ['Ожидается список slug.']})
+        if len(creates) + len(updates) + len(deletes) > (
+            settings.NOTES_API_BATCH_LIMIT
+        ):
+            raise ApiError(400, {'body': [
+                f'Не больше {settings.NOTES_API_BATCH_LIMIT} операций '
+                'в пакете.'
+            ]})
+        # Исключение с ошибками откатывает всю транзакцию пакета.
+        with transaction.atomic():
+            result = self.apply(creates, updates, deletes)
+        return JsonResponse(result)
+
+    def apply(self, creates, updates, deletes):
+        errors = {}
+        result = {
+            'created': self.apply_creates(creates, errors),
+            'updated': self.apply_updates(updates, errors),
+        }
+        queryset = self.get_queryset().filter(slug__in=deletes)
+        found = set(queryset.values_list('slug', flat=True))
+        for index, slug in enumerate(deletes):
+            if slug not in found:
+                errors[f'delete.{index}'] = {
+                    'slug': [f'Заметка {slug} не найдена.']
+                }
+        if errors:
+            raise ApiError(400, errors)
+        queryset.trash()
+        result['deleted'] = sorted(found)
+        return result
+
+    def apply_creates(self, creates, errors):
+        created = []
+        for index, data in enumerate(creates):
+            try:
+                created.append(serialize(self.save_form(data)))
+            except ApiError as error:
+                errors[f'create.{index}'] = error.errors
+        return created
+
+    def apply_updates(self, updates, errors):
+        updates = [
+            data if isinstance(data, dict)
+            and isinstance(data.get('slug'), str) else {}
+            for data in updates
+        ]
+        notes = self.get_queryset().in_bulk(
+            [data['slug'] for data in updates if data], field_name='slug'
+        )
+        updated = []
+        for index, data in enumerate(updates):
+            note = notes.get(data.get('slug'))
+            if note is None:
+                errors[f'update.{index}'] = {'slug': ['Заметка не найдена.']}
+                continue
+            try:
+                updated.append(serialize(self.save_form(
+                    data.get('changes', {}), note, partial=True
+                )))
+            except ApiError as error:
+                errors[f'update.{index}'] = error.errors
+        return updated
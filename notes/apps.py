@@ -1,6 +1,24 @@
 from django.apps import AppConfig
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_out
+from django.core.checks import Tags, register
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save
 
 
 class NotesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'notes'
+
+    def ready(self):
+        from .auth import forget_user_on_logout, forget_user_on_save
+        from .checks import check_shared_caches
+        from .db import apply_sqlite_pragmas, register_sqlite_functions
+        from .search import install_triggers
+        register(check_shared_caches, Tags.caches)
+        connection_created.connect(apply_sqlite_pragmas)
+        connection_created.connect(register_sqlite_functions)
+        post_migrate.connect(install_triggers, sender=self)
+        user_logged_out.connect(forget_user_on_logout)
+        post_save.connect(forget_user_on_save, sender=get_user_model())
+        post_delete.connect(forget_user_on_save, sender=get_user_model())
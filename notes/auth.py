@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.utils.crypto import constant_time_compare
+
+USER_KEY = 'auth:user:{user_id}'
+
+
+def user_cache():
+    return caches[settings.AUTH_USER_CACHE_ALIAS]
+
+
+def get_cached_user(request):
+    """Как django.contrib.auth.get_user, но пользователь берётся из кеша.
+
+    Хеш сессии сверяется с закешированным пользователем так же, как это
+    делает Django, поэтому смена пароля завершает другие сессии.
+    """
+    try:
+        user_id = request.session[auth.SESSION_KEY]
+        backend_path = request.session[auth.BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+    key = USER_KEY.format(user_id=user_id)
+    user = user_cache().get(key)
+    if user is None:
+        user = auth.get_user(request)
+        if user.is_authenticated:
+            user_cache().set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user
+    session_hash = request.session.get(auth.HASH_SESSION_KEY)
+    if not session_hash or not constant_time_compare(
+        session_hash, user.get_session_auth_hash()
+    ):
+        request.session.flush()
+        return AnonymousUser()
+    return user
+
+
+def forget_user(user_id):
+    user_cache().delete(USER_KEY.format(user_id=user_id))
+
+
+def forget_user_on_logout(sender, request, user, **kwargs):
+    if user is not None:
+        forget_user(user.pk)
+
+
+def forget_user_on_save(sender, instance, **kwargs):
+    """Любое изменение пользователя, включая смену пароля, сбрасывает кеш."""
+    forget_user(instance.pk)
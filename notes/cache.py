@@ -0,0 +1,67 @@
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = 'notes:version:{author_id}'
+DATA_KEY = 'notes:{author_id}:{version}:{name}'
+
+_MISSING = object()
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(event):
+    with _stats_lock:
+        _stats[event] += 1
+
+
+def stats():
+    """Счётчики попаданий и промахов кеша в текущем процессе."""
+    with _stats_lock:
+        return {'hits': _stats['hits'], 'misses': _stats['misses']}
+
+
+def get_version(author_id):
+    """Текущая версия данных автора.
+
+    Начальное значение берётся из времени, а не с единицы: если ключ
+    версии вытеснен из кеша, новая версия не совпадёт со старыми ключами.
+    """
+    key = VERSION_KEY.format(author_id=author_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns() // 1000, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(author_id):
+    """Делает устаревшими все закешированные страницы автора за O(1)."""
+    key = VERSION_KEY.format(author_id=author_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns() // 1000, timeout=None)
+
+
+def bump_versions(author_ids):
+    for author_id in set(author_ids):
+        bump_version(author_id)
+
+
+def get_or_set(author_id, name, default):
+    """Данные автора из кеша или результат default() с сохранением."""
+    key = DATA_KEY.format(
+        author_id=author_id, version=get_version(author_id), name=name
+    )
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        _count('hits')
+        return value
+    _count('misses')
+    value = default()
+    cache.set(key, value, settings.NOTES_CACHE_TIMEOUT)
+    return value
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.checks import Error
+
+LOCMEM = 'django.core.cache.backends.locmem.LocMemCache'
+CACHED_SESSIONS = (
+    'django.contrib.sessions.backends.cache',
+    'django.contrib.sessions.backends.cached_db',
+)
+
+
+def check_shared_caches(app_configs, **kwargs):
+    """Кеш сессий и пользователей не должен быть своим у каждого процесса.
+
+    Иначе выход или смена пароля сбрасывают кеш только в процессе,
+    обработавшем запрос, а остальные ещё AUTH_USER_CACHE_TIMEOUT секунд
+    или до конца сессии пускают пользователя.
+    """
+    aliases = {'AUTH_USER_CACHE_ALIAS': settings.AUTH_USER_CACHE_ALIAS}
+    if settings.SESSION_ENGINE in CACHED_SESSIONS:
+        aliases['SESSION_CACHE_ALIAS'] = settings.SESSION_CACHE_ALIAS
+    return [
+        Error(
+            f'{name} = {alias!r} использует LocMemCache, он не общий '
+            'для процессов сервера.',
+            hint='Укажите общий кеш: файловый, memcached или redis.',
+            id='notes.E001',
+        )
+        for name, alias in aliases.items()
+        if settings.CACHES[alias]['BACKEND'] == LOCMEM
+    ]
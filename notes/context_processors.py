@@ -0,0 +1,23 @@
+from django.utils.functional import SimpleLazyObject
+
+from .cache import get_or_set
+from .models import NoteStats
+
+
+def note_stats(request):
+    """Число заметок и их объём для шапки.
+
+    Строка статистики читается из кеша автора и только если шаблон
+    её выводит.
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+
+    def load():
+        return get_or_set(
+            user.pk, 'stats',
+            lambda: NoteStats.objects.filter(user_id=user.pk).first()
+            or NoteStats(user_id=user.pk),
+        )
+    return {'note_stats': SimpleLazyObject(load)}
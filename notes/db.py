@@ -0,0 +1,44 @@
+from django.conf import settings
+
+from .fields import note_text
+
+# Профиль для нагруженной SQLite: WAL позволяет читать во время записи,
+# synchronous=NORMAL в режиме WAL не теряет целостность при сбое процесса.
+TUNED_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+# Меняют файл базы или режим записи: соединению реплики только для
+# чтения (mode=ro) они недоступны.
+WRITE_PRAGMAS = ('journal_mode', 'synchronous')
+
+
+def is_read_only(connection):
+    return 'mode=ro' in str(connection.settings_dict['NAME'])
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """Применяет TUNED_PRAGMAS к новому соединению, если профиль включён."""
+    if connection.vendor != 'sqlite' or not settings.SQLITE_TUNED:
+        return
+    read_only = is_read_only(connection)
+    with connection.cursor() as cursor:
+        for name, value in TUNED_PRAGMAS.items():
+            if read_only and name in WRITE_PRAGMAS:
+                continue
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def register_sqlite_functions(sender, connection, **kwargs):
+    """Функции, на которые опираются поисковый индекс и его триггеры."""
+    if connection.vendor != 'sqlite':
+        return
+    connection.connection.create_function(
+        'note_text', 1, note_text, deterministic=True
+    )
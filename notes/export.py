@@ -0,0 +1,64 @@
+import json
+import zipfile
+
+CHUNK_SIZE = 500
+
+FORMATS = {
+    'jsonl': ('application/x-ndjson', 'notes.jsonl'),
+    'zip': ('application/zip', 'notes.zip'),
+}
+
+
+def _notes(queryset):
+    return queryset.order_by('id').iterator(chunk_size=CHUNK_SIZE)
+
+
+def iter_jsonl(queryset):
+    """Заметки по одной строке JSON; в памяти не больше одной пачки."""
+    for note in _notes(queryset):
+        record = {
+            'id': note.id,
+            'title': note.title,
+            'slug': note.slug,
+            'text': note.text,
+            'updated_at': note.updated_at.isoformat(),
+        }
+        yield json.dumps(record, ensure_ascii=False).encode() + b'\n'
+
+
+class _StreamBuffer:
+    """Буфер без seek: zipfile пишет в него архив потоково."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_markdown_zip(queryset):
+    """ZIP-архив с файлом Markdown на каждую заметку, отдаётся по частям."""
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for note in _notes(queryset):
+            content = f'# {note.title}\n\n{note.text}\n'
+            archive.writestr(f'{note.slug}.md', content.encode())
+            data = buffer.pop()
+            if data:
+                yield data
+    yield buffer.pop()
+
+
+def iter_export(queryset, export_format):
+    if export_format == 'zip':
+        return iter_markdown_zip(queryset)
+    return iter_jsonl(queryset)
@@ -0,0 +1,144 @@
+import zlib
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Сжатые значения хранятся в SQLite как BLOB, несжатые - как TEXT, поэтому
+# их различает тип значения, а заголовок указывает алгоритм.
+ZLIB_HEADER = b'\x00z'
+ZSTD_HEADER = b'\x00s'
+
+
+def compress(data, method=None):
+    """Сжимает байты UTF-8 с заголовком алгоритма."""
+    method = method or settings.NOTES_TEXT_COMPRESSION
+    if method == 'zstd':
+        if zstandard is None:
+            raise ImproperlyConfigured(
+                'Для NOTES_TEXT_COMPRESSION = "zstd" установите zstandard.'
+            )
+        return ZSTD_HEADER + zstandard.ZstdCompressor().compress(data)
+    return ZLIB_HEADER + zlib.compress(data)
+
+
+def decompress(data):
+    header, payload = bytes(data[:2]), data[2:]
+    if header == ZSTD_HEADER:
+        if zstandard is None:
+            raise ImproperlyConfigured(
+                'Текст сжат zstd, а пакет zstandard не установлен.'
+            )
+        return zstandard.ZstdDecompressor().decompress(payload).decode()
+    if header == ZLIB_HEADER:
+        return zlib.decompress(payload).decode()
+    raise ValueError('Неизвестный формат сжатого текста.')
+
+
+def note_text(value):
+    """Функция SQLite note_text: распаковывает сжатый текст колонки."""
+    if isinstance(value, bytes):
+        return decompress(value)
+    return value
+
+
+class CompressedText:
+    """Сжатое значение, ещё не распакованное после загрузки из базы."""
+
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = bytes(data)
+
+    def __str__(self):
+        return decompress(self.data)
+
+    def __eq__(self, other):
+        if isinstance(other, CompressedText):
+            return self.data == other.data
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.data)
+
+
+class CompressedTextDescriptor(DeferredAttribute):
+    """Распаковывает текст при первом обращении к атрибуту.
+
+    Пока атрибут не прочитан, в экземпляре лежит CompressedText, и
+    сохранение без изменений пишет те же байты без повторного сжатия.
+    """
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        value = super().__get__(instance, cls)
+        if isinstance(value, CompressedText):
+            value = instance.__dict__[self.field.attname] = str(value)
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = value
+
+
+class CompressedTextField(models.TextField):
+    """TextField, который в SQLite сжимает значения длиннее порога.
+
+    Порог в байтах UTF-8 задаёт NOTES_TEXT_COMPRESS_THRESHOLD (None
+    отключает сжатие), алгоритм - NOTES_TEXT_COMPRESSION: zlib или zstd.
+    """
+
+    descriptor_class = CompressedTextDescriptor
+
+    def from_db_value(self, value, expression, connection):
+        if isinstance(value, bytes):
+            return CompressedText(value)
+        return value
+
+    def to_python(self, value):
+        if isinstance(value, CompressedText):
+            return str(value)
+        return super().to_python(value)
+
+    def pre_save(self, model_instance, add):
+        # Не распаковываем текст, который не читали и не меняли.
+        if self.attname in model_instance.__dict__:
+            return model_instance.__dict__[self.attname]
+        return super().pre_save(model_instance, add)
+
+    def get_prep_value(self, value):
+        if isinstance(value, CompressedText):
+            return value
+        return super().get_prep_value(value)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        value = super().get_db_prep_value(value, connection, prepared)
+        if isinstance(value, CompressedText):
+            return str(value)
+        return value
+
+    def get_db_prep_save(self, value, connection):
+        if isinstance(value, CompressedText):
+            if connection.vendor == 'sqlite':
+                return value.data
+            return str(value)
+        value = self.get_db_prep_value(value, connection)
+        threshold = settings.NOTES_TEXT_COMPRESS_THRESHOLD
+        # Символ UTF-8 занимает до 4 байт: короткий текст не кодируем.
+        if (
+            connection.vendor != 'sqlite' or value is None
+            or threshold is None or len(value) <= threshold // 4
+        ):
+            return value
+        data = value.encode()
+        if len(data) <= threshold:
+            return value
+        compressed = compress(data)
+        # Несжимаемый текст хранится как есть.
+        return compressed if len(compressed) < len(data) else value
@@ -1,29 +1,105 @@
-from pytils.translit import slugify
-
 from django import forms
 from django.core.exceptions import ValidationError
 
-from .models import Note
+from .models import Note, Tag
 
 WARNING = ' - такой slug уже существует, придумайте уникальное значение!'
+MAX_TAGS = 20
+
+
+class TagsField(forms.CharField):
+    """Метки через запятую; значение поля - список названий без повторов."""
+
+    def prepare_value(self, value):
+        if isinstance(value, (list, tuple)):
+            return ', '.join(value)
+        return value
+
+    def to_python(self, value):
+        names = []
+        for name in super().to_python(value).split(','):
+            name = ' '.join(name.split())
+            if name and name not in names:
+                names.append(name)
+        return names
+
+    def has_changed(self, initial, data):
+        return self.to_python(self.prepare_value(initial)) != (
+            self.to_python(data)
+        )
+
+    def validate(self, value):
+        super().validate(value)
+        if len(value) > MAX_TAGS:
+            raise ValidationError(f'Не больше {MAX_TAGS} меток.')
+        max_length = Tag._meta.get_field('name').max_length
+        for name in value:
+            if len(name) > max_length:
+                raise ValidationError(
+                    f'Метка {name[:20]}... длиннее {max_length} символов.'
+                )
 
 
 class NoteForm(forms.ModelForm):
     """Форма для создания или обновления заметки."""
 
+    # Версия заметки на момент открытия формы: по ней находятся
+    # параллельные правки.
+    version = forms.IntegerField(
+        required=False, min_value=1, widget=forms.HiddenInput
+    )
+    tags = TagsField(
+        label='Метки', required=False, help_text='Через запятую'
+    )
+
     class Meta:
         model = Note
         fields = ('title', 'text', 'slug')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.initial.setdefault('version', self.instance.version)
+            self.initial.setdefault('tags', self.instance.tag_names())
+
+    def save_tags(self):
+        """Сохраняет метки, если они изменились; заметка уже сохранена."""
+        if 'tags' in self.changed_data:
+            self.instance.set_tags(self.cleaned_data['tags'])
+
     def clean_slug(self):
-        """Обрабатывает случай, если slug не уникален."""
-        cleaned_data = super().clean()
-        slug = cleaned_data.get('slug')
+        """Обрабатывает случай, если указанный slug не уникален.
+
+        Пустой slug подбирается при сохранении заметки из заголовка,
+        с суффиксом, если такой адрес уже занят.
+        """
+        slug = self.cleaned_data.get('slug')
         if not slug:
-            title = cleaned_data.get('title')
-            slug = slugify(title)[:100]
-        if Note.objects.filter(
+            return slug
+        if Note.all_objects.filter(
                 slug=slug
         ).exclude(id=self.instance.pk).exists():
             raise ValidationError(slug + WARNING)
         return slug
+
+
+class NoteIdsField(forms.Field):
+    """Список id заметок из нескольких значений одного поля."""
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        try:
+            return [int(pk) for pk in value or ()]
+        except (TypeError, ValueError):
+            raise ValidationError('Некорректный список заметок.')
+
+
+class BulkActionForm(forms.Form):
+    """Действие над отмеченными заметками."""
+
+    action = forms.ChoiceField(choices=(
+        ('trash', 'В корзину'),
+        ('restore', 'Восстановить'),
+        ('purge', 'Удалить навсегда'),
+    ))
+    notes = NoteIdsField(required=False)
@@ -0,0 +1,141 @@
+"""Очередь фоновых задач в таблице notes_job без внешнего брокера.
+
+Запрос только добавляет строку задачи, а выполняют её процессы
+manage.py run_workers. Задача - функция модуля, аргументы хранятся
+в JSON. Выполненная задача удаляется; упавшая повторяется с растущей
+паузой, а после NOTES_JOBS_MAX_ATTEMPTS попыток остаётся в таблице
+с failed_at и текстом ошибки.
+"""
+import json
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, connections
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Кандидатов на одну выборку: часть из них могут перехватить соседи.
+CLAIM_BATCH = 10
+
+
+def enqueue(func, *args, key=None, group='', delay=0):
+    """Добавляет вызов func(*args) в очередь одним INSERT.
+
+    Пока задача с тем же key ждёт выполнения, новая не добавляется.
+    Добавление внутри транзакции откатывается вместе с ней.
+    """
+    Job.objects.bulk_create([Job(
+        name=f'{func.__module__}.{func.__qualname__}',
+        args=json.dumps(args, ensure_ascii=False),
+        key=key,
+        group=group,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )], ignore_conflicts=True)
+
+
+def claim():
+    """Занимает первую готовую задачу или возвращает None.
+
+    Задача занимается условным UPDATE по числу попыток: из параллельных
+    воркеров его выполнит только один. Пока задача не завершена, более
+    поздние задачи её группы ждут.
+    """
+    now = timezone.now()
+    earlier = Job.objects.filter(
+        group=OuterRef('group'), pk__lt=OuterRef('pk'), failed_at=None
+    )
+    ready = Job.objects.filter(
+        Q(locked_until=None) | Q(locked_until__lt=now),
+        Q(group='') | ~Exists(earlier),
+        failed_at=None,
+        run_at__lte=now,
+    ).values_list('pk', 'attempts')[:CLAIM_BATCH]
+    lease = timedelta(seconds=settings.NOTES_JOBS_LEASE)
+    for pk, attempts in ready:
+        # Ключ освобождается сразу: правка во время выполнения задачи
+        # должна поставить новую.
+        claimed = Job.objects.filter(pk=pk, attempts=attempts).update(
+            locked_until=now + lease, attempts=attempts + 1, key=None
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def run_job(job):
+    """Выполняет задачу; при ошибке назначает повтор или отказ."""
+    try:
+        import_string(job.name)(*json.loads(job.args))
+    except Exception:
+        logger.exception('Задача %s (%s) не выполнена', job.pk, job.name)
+        now = timezone.now()
+        changes = {'locked_until': None, 'error': traceback.format_exc()}
+        if job.attempts >= settings.NOTES_JOBS_MAX_ATTEMPTS:
+            changes['failed_at'] = now
+        else:
+            changes['run_at'] = now + timedelta(
+                seconds=settings.NOTES_JOBS_RETRY_DELAY
+                * 2 ** (job.attempts - 1)
+            )
+        Job.objects.filter(pk=job.pk).update(**changes)
+        return False
+    Job.objects.filter(pk=job.pk).delete()
+    return True
+
+
+def work(stop, poll=1.0, once=False):
+    """Выполняет задачи, пока не выставлен stop; возвращает их число.
+
+    once - выйти, когда готовых задач не останется.
+    """
+    done = 0
+    while not stop.is_set():
+        try:
+            job = claim()
+        except OperationalError:
+            # Блокировку записи SQLite держит другой процесс.
+            logger.warning('База занята, задача не получена', exc_info=True)
+            job = None
+        if job is not None:
+            run_job(job)
+            done += 1
+        elif once:
+            break
+        else:
+            stop.wait(poll)
+    return done
+
+
+def _work_in_thread(stop, poll, once):
+    try:
+        return work(stop, poll, once)
+    finally:
+        connections.close_all()
+
+
+def run_workers(threads=1, poll=1.0, once=False, stop=None):
+    """Запускает threads воркеров и ждёт их завершения.
+
+    Один воркер работает в текущем потоке и его соединении с БД.
+    """
+    stop = stop or threading.Event()
+    if threads == 1:
+        return work(stop, poll, once)
+    with ThreadPoolExecutor(threads, thread_name_prefix='jobs') as pool:
+        futures = [
+            pool.submit(_work_in_thread, stop, poll, once)
+            for _ in range(threads)
+        ]
+        try:
+            return sum(future.result() for future in futures)
+        finally:
+            stop.set()
@@ -0,0 +1,44 @@
+"""Загрузчики шаблонов, убирающие отступы из HTML до компиляции.
+
+Вместе с django.template.loaders.cached.Loader исходник сжимается
+один раз на процесс, а отрисовка не тратит на это времени.
+"""
+import re
+
+from django.template.loaders import app_directories, filesystem
+
+# Внутри этих тегов пробельные символы значимы.
+PRESERVED = re.compile(
+    r'(<(pre|textarea)\b.*?</\2\s*>)', re.IGNORECASE | re.DOTALL
+)
+# Перевод строки с отступами вокруг: браузер показывает его как один
+# пробел, как и сам перевод строки.
+LINE_BREAK = re.compile(r'[ \t\r\f\v]*\n\s*')
+
+
+def minify(source):
+    """Заменяет переводы строк с отступами одним переводом строки."""
+    parts = PRESERVED.split(source)
+    # split возвращает текст, блок целиком и имя тега по очереди.
+    for index in range(0, len(parts), 3):
+        parts[index] = LINE_BREAK.sub('\n', parts[index])
+    return ''.join(
+        part for index, part in enumerate(parts) if index % 3 != 2
+    )
+
+
+class MinifyMixin:
+
+    def get_contents(self, origin):
+        contents = super().get_contents(origin)
+        if origin.name.endswith('.html'):
+            return minify(contents)
+        return contents
+
+
+class FilesystemLoader(MinifyMixin, filesystem.Loader):
+    pass
+
+
+class AppDirectoriesLoader(MinifyMixin, app_directories.Loader):
+    pass
@@ -0,0 +1,44 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.export import FORMATS, iter_export
+from notes.models import Note
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Выгружает заметки пользователя в JSONL или ZIP с Markdown.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--author', required=True, help='Имя пользователя-автора.'
+        )
+        parser.add_argument(
+            '--format', choices=tuple(FORMATS), default='jsonl'
+        )
+        parser.add_argument(
+            '--output', default='-',
+            help='Путь к файлу или "-" для вывода в stdout.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            author = User.objects.get(username=options['author'])
+        except User.DoesNotExist:
+            raise CommandError(
+                f'Пользователь {options["author"]} не найден.'
+            )
+        chunks = iter_export(
+            Note.objects.filter(author=author), options['format']
+        )
+        if options['output'] == '-':
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+        with open(options['output'], 'wb') as output:
+            for chunk in chunks:
+                output.write(chunk)
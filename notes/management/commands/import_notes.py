@@ -0,0 +1,129 @@
+import csv
+import json
+import sys
+import time
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_slug
+from django.db import DatabaseError, transaction
+
+from notes.models import Note
+from notes.slugs import SlugAllocator
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует заметки из JSONL или CSV (поля title, text, slug) '
+        'пакетами через bulk_create.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Путь к файлу или "-" для чтения из stdin.'
+        )
+        parser.add_argument(
+            '--author', required=True, help='Имя пользователя-автора.'
+        )
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'),
+            help='Формат данных; по умолчанию определяется по расширению.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--skip', type=int, default=0,
+            help='Пропустить первые N записей, чтобы продолжить импорт.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            author = User.objects.get(username=options['author'])
+        except User.DoesNotExist:
+            raise CommandError(
+                f'Пользователь {options["author"]} не найден.'
+            )
+        path = options['path']
+        data_format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'jsonl'
+        )
+        if path == '-':
+            self.import_stream(sys.stdin, data_format, author, options)
+        else:
+            with open(path, encoding='utf-8', newline='') as stream:
+                self.import_stream(stream, data_format, author, options)
+
+    def import_stream(self, stream, data_format, author, options):
+        reader = read_csv if data_format == 'csv' else read_jsonl
+        skip = options['skip']
+        records = islice(reader(stream), skip, None)
+        allocator = SlugAllocator(
+            Note.all_objects.values_list('slug', flat=True).iterator()
+        )
+        batch_size = options['batch_size']
+        imported = 0
+        position = skip
+        started = time.monotonic()
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
+            notes = [
+                build_note(record, author, allocator) for record in batch
+            ]
+            try:
+                with transaction.atomic():
+                    Note.objects.bulk_create(notes)
+            except DatabaseError as error:
+                raise CommandError(
+                    f'Пакет, начиная с записи {position + 1}, не загружен: '
+                    f'{error}. Импортировано {imported}. Продолжить можно '
+                    f'с ключом --skip {position}.'
+                )
+            imported += len(notes)
+            position += len(notes)
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'Импортировано {imported} '
+                f'({imported / elapsed if elapsed else 0:.0f} заметок/с)'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {imported} заметок за '
+            f'{time.monotonic() - started:.1f} с.'
+        ))
+
+
+def build_note(record, author, allocator):
+    title_field = Note._meta.get_field('title')
+    title = (record.get('title') or title_field.default)[
+        :title_field.max_length
+    ]
+    slug = record.get('slug') or ''
+    try:
+        validate_slug(slug)
+    except ValidationError:
+        # Недопустимый slug сломал бы ссылки на заметку: берём из заголовка.
+        slug = ''
+    return Note(
+        title=title,
+        text=record.get('text') or '',
+        slug=allocator.allocate(title, slug),
+        author=author,
+    )
+
+
+def read_jsonl(stream):
+    for number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as error:
+            raise CommandError(f'Строка {number}: некорректный JSON: {error}')
+
+
+def read_csv(stream):
+    yield from csv.DictReader(stream)
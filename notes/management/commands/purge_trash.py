@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from notes.trash import PURGE_BATCH_SIZE, purge_trash
+
+
+class Command(BaseCommand):
+    help = 'Окончательно удаляет старые заметки из корзины небольшими пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.NOTES_TRASH_DAYS,
+            help='Сколько дней заметка лежит в корзине до удаления.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=PURGE_BATCH_SIZE,
+            help='Заметок в одной транзакции.',
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0.05,
+            help='Пауза между пачками в секундах.',
+        )
+
+    def handle(self, *args, **options):
+        deleted = purge_trash(
+            timedelta(days=options['days']),
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+        )
+        self.stdout.write(f'Удалено заметок из корзины: {deleted}.')
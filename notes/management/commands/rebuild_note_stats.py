@@ -0,0 +1,33 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from notes.cache import bump_versions
+from notes.models import NoteStats
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает статистику заметок пользователей пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Пользователей в одной транзакции.',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk').values_list('pk', flat=True)
+        last_id = 0
+        total = 0
+        while True:
+            batch = list(
+                users.filter(pk__gt=last_id)[:options['batch_size']]
+            )
+            if not batch:
+                break
+            last_id = batch[-1]
+            NoteStats.objects.rebuild(batch)
+            bump_versions(batch)
+            total += len(batch)
+        self.stdout.write(f'Статистика пересчитана: {total} пользователей.')
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from notes.jobs import run_workers
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди notes_job.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=1,
+            help='Сколько задач выполняется параллельно. SQLite пишет в '
+                 'один поток, больше одного имеет смысл для долгих задач.',
+        )
+        parser.add_argument(
+            '--poll', type=float, default=1.0,
+            help='Пауза между проверками пустой очереди в секундах.',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выйти, когда готовых задач не останется.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            done = run_workers(
+                options['threads'], options['poll'], options['once']
+            )
+        except KeyboardInterrupt:
+            return
+        self.stdout.write(f'Выполнено задач: {done}.')
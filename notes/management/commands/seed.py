@@ -0,0 +1,66 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.seed import (BATCH_SIZE, DISTRIBUTIONS, NoteGenerator,
+                        create_users, seed_notes)
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт детерминированный набор пользователей и заметок '
+        'для нагрузочного тестирования.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument(
+            '--notes', type=int, default=100,
+            help='Число заметок у каждого пользователя.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--distribution', choices=DISTRIBUTIONS, default='lognormal',
+            help='Распределение длины текста в словах.',
+        )
+        parser.add_argument(
+            '--words', type=int, default=50,
+            help='Средняя длина текста в словах.',
+        )
+        parser.add_argument(
+            '--prefix', default='user',
+            help='Имена пользователей: PREFIX-1, PREFIX-2, ...',
+        )
+        parser.add_argument(
+            '--password', help='Пароль пользователей; без него вход закрыт.'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}-').exists():
+            raise CommandError(
+                f'Пользователи {prefix}-N уже есть, выберите другой --prefix.'
+            )
+        started = time.monotonic()
+        users = create_users(
+            options['users'], prefix, options['password'],
+            options['batch_size'],
+        )
+        # bulk_create в SQLite не возвращает id, перечитываем авторов.
+        authors = User.objects.filter(
+            username__startswith=f'{prefix}-'
+        ).order_by('id')
+        generator = NoteGenerator(
+            options['seed'], options['distribution'], options['words']
+        )
+        created = seed_notes(
+            authors, options['notes'], generator, options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано {len(users)} пользователей и {created} заметок за '
+            f'{time.monotonic() - started:.1f} с.'
+        ))
@@ -0,0 +1,61 @@
+import base64
+import hashlib
+import re
+from pathlib import Path
+from urllib.request import urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import get_template
+
+from notes.static import BOOTSTRAP, CRITICAL_CSS, critical_css
+
+CLASS_ATTRIBUTE = re.compile(r'class="([^"]*)"')
+
+
+def template_classes(names):
+    """Классы из атрибутов class шаблонов, кроме подставляемых тегами."""
+    classes = set()
+    for name in names:
+        source = get_template(name).template.source
+        for value in CLASS_ATTRIBUTE.findall(source):
+            classes.update(
+                item for item in value.split() if '{' not in item
+            )
+    return classes
+
+
+class Command(BaseCommand):
+    help = (
+        'Скачивает NOTES_BOOTSTRAP_URL в static/vendor, проверяет '
+        'NOTES_BOOTSTRAP_INTEGRITY и строит из него css/critical.css.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--templates', nargs='+',
+            default=['base.html', 'includes/header.html'],
+            help='Шаблоны первого экрана: их классы попадут в critical.css.',
+        )
+
+    def handle(self, *args, **options):
+        with urlopen(settings.NOTES_BOOTSTRAP_URL, timeout=30) as response:
+            data = response.read()
+        digest = base64.b64encode(hashlib.sha384(data).digest()).decode()
+        if f'sha384-{digest}' != settings.NOTES_BOOTSTRAP_INTEGRITY:
+            raise CommandError(
+                'Хеш скачанного файла не совпал с NOTES_BOOTSTRAP_INTEGRITY.'
+            )
+        root = Path(settings.STATICFILES_DIRS[0])
+        target = root / BOOTSTRAP
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+        critical = critical_css(
+            data.decode(), template_classes(options['templates'])
+        )
+        (root / CRITICAL_CSS).parent.mkdir(parents=True, exist_ok=True)
+        (root / CRITICAL_CSS).write_text(critical + '\n', encoding='utf-8')
+        self.stdout.write(
+            f'{BOOTSTRAP}: {len(data)} байт, '
+            f'{CRITICAL_CSS}: {len(critical)} байт.'
+        )
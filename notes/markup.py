@@ -0,0 +1,182 @@
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+# Меняется вместе с правилами разметки, чтобы старый кеш не использовался.
+RENDERER_VERSION = 2
+CACHE_KEY = 'markdown:{version}:{digest}'
+
+HEADING = re.compile(r'(#{1,6})\s+(.*)')
+RULE = re.compile(r'(?:-{3,}|\*{3,})\s*')
+UNORDERED_ITEM = re.compile(r'[-*+]\s+(.*)')
+ORDERED_ITEM = re.compile(r'\d{1,9}[.)]\s+(.*)')
+QUOTE = re.compile(r'>\s?(.*)')
+FENCE = '```'
+
+# Шаблоны без вложенных повторов: время работы линейно от длины строки.
+CODE_SPAN = re.compile(r'(`[^`\n]+`)')
+LINK = re.compile(r'\[([^\[\]\n]+)\]\(([^()\s]+)\)')
+STRONG = re.compile(r'\*\*([^*\n]+)\*\*')
+EMPHASIS = re.compile(r'\*([^*\n]+)\*')
+# Адрес /\evil.com браузер открывает как //evil.com, то есть другой сайт.
+SAFE_URL = re.compile(r'(?:https?://|mailto:|/(?![/\\])|#)', re.IGNORECASE)
+
+
+def _emphasis(text):
+    text = STRONG.sub(r'<strong>\1</strong>', text)
+    return EMPHASIS.sub(r'<em>\1</em>', text)
+
+
+def _link(text, url):
+    if not SAFE_URL.match(url):
+        return _emphasis(f'[{text}]({url})')
+    return f'<a href="{url}" rel="nofollow noopener">{_emphasis(text)}</a>'
+
+
+def _links(text):
+    """Ссылки и акценты; акценты не заходят в адреса и через теги ссылок."""
+    parts = LINK.split(text)
+    # split возвращает текст, подпись и адрес ссылки по очереди.
+    html = [_emphasis(parts[0])]
+    for index in range(1, len(parts), 3):
+        html.append(_link(parts[index], parts[index + 1]))
+        html.append(_emphasis(parts[index + 2]))
+    return ''.join(html)
+
+
+def render_inline(text):
+    """Строчная разметка; текст экранируется до подстановки тегов."""
+    parts = CODE_SPAN.split(escape(text))
+    for index, part in enumerate(parts):
+        if index % 2:
+            parts[index] = f'<code>{part[1:-1]}</code>'
+        else:
+            parts[index] = _links(part)
+    return ''.join(parts)
+
+
+class _Renderer:
+    """Построчный разбор подмножества Markdown за один проход."""
+
+    def __init__(self):
+        self.html = []
+        self.paragraph = []
+        self.quote = []
+        self.list_tag = None
+        self.items = []
+        self.code = None
+
+    def flush(self):
+        if self.paragraph:
+            self.html.append(
+                '<p>' + '<br>'.join(map(render_inline, self.paragraph))
+                + '</p>'
+            )
+            self.paragraph = []
+        if self.quote:
+            self.html.append(
+                '<blockquote><p>'
+                + '<br>'.join(map(render_inline, self.quote))
+                + '</p></blockquote>'
+            )
+            self.quote = []
+        if self.items:
+            items = ''.join(
+                f'<li>{render_inline(item)}</li>' for item in self.items
+            )
+            self.html.append(f'<{self.list_tag}>{items}</{self.list_tag}>')
+            self.items = []
+            self.list_tag = None
+
+    def add_item(self, tag, text):
+        if self.list_tag != tag:
+            self.flush()
+            self.list_tag = tag
+        self.items.append(text)
+
+    def feed(self, line):
+        if self.code is not None:
+            if line.startswith(FENCE):
+                self.html.append(
+                    '<pre><code>' + escape('\n'.join(self.code))
+                    + '</code></pre>'
+                )
+                self.code = None
+            else:
+                self.code.append(line)
+            return
+        stripped = line.strip()
+        if stripped.startswith(FENCE):
+            self.flush()
+            self.code = []
+        elif not stripped:
+            self.flush()
+        elif RULE.fullmatch(stripped):
+            self.flush()
+            self.html.append('<hr>')
+        else:
+            self.feed_text(stripped)
+
+    def feed_text(self, line):
+        heading = HEADING.fullmatch(line)
+        unordered = UNORDERED_ITEM.fullmatch(line)
+        ordered = ORDERED_ITEM.fullmatch(line)
+        quote = QUOTE.fullmatch(line)
+        if heading:
+            self.flush()
+            level = len(heading.group(1))
+            self.html.append(
+                f'<h{level}>{render_inline(heading.group(2))}</h{level}>'
+            )
+        elif unordered:
+            self.add_item('ul', unordered.group(1))
+        elif ordered:
+            self.add_item('ol', ordered.group(1))
+        elif quote:
+            if not self.quote:
+                self.flush()
+            self.quote.append(quote.group(1))
+        else:
+            if self.items or self.quote:
+                self.flush()
+            self.paragraph.append(line)
+
+    def close(self):
+        if self.code is not None:
+            # Незакрытый блок кода выводится до конца текста.
+            self.feed(FENCE)
+        self.flush()
+        return '\n'.join(self.html)
+
+
+def render_markdown(text):
+    """HTML из Markdown: заголовки, списки, цитаты, код, ссылки, акценты.
+
+    Сырой HTML не поддерживается: весь текст экранируется. Текст длиннее
+    NOTES_MARKDOWN_MAX_LENGTH выводится без разметки.
+    """
+    if len(text) > settings.NOTES_MARKDOWN_MAX_LENGTH:
+        return mark_safe(f'<pre>{escape(text)}</pre>')
+    renderer = _Renderer()
+    for line in text.splitlines():
+        renderer.feed(line)
+    return mark_safe(renderer.close())
+
+
+def cache_key(text):
+    digest = hashlib.sha1(text.encode()).hexdigest()
+    return CACHE_KEY.format(version=RENDERER_VERSION, digest=digest)
+
+
+def cached_markdown(text):
+    """HTML из кеша по хешу текста: неизменённый текст не разбирается."""
+    key = cache_key(text)
+    html = cache.get(key)
+    if html is None:
+        html = render_markdown(text)
+        cache.set(key, html, settings.NOTES_MARKDOWN_CACHE_TIMEOUT)
+    return mark_safe(html)
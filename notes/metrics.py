@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import Counter, defaultdict
+
+from . import cache as notes_cache
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        for bound, count in zip(self.buckets, self.counts):
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {count}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class QueryCounter:
+    """execute_wrapper, считающий запросы и время в БД."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class Registry:
+    """Метрики процесса; все изменения и чтение идут под одной блокировкой."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = Counter()
+            self.latency = defaultdict(Histogram)
+            self.render = defaultdict(Histogram)
+            self.queries = Counter()
+            self.query_seconds = Counter()
+
+    def record(self, view, status, duration, queries, query_seconds,
+               render_seconds=None):
+        with self._lock:
+            self.requests[view, status] += 1
+            self.latency[view].observe(duration)
+            self.queries[view] += queries
+            self.query_seconds[view] += query_seconds
+            if render_seconds is not None:
+                self.render[view].observe(render_seconds)
+
+    def render_text(self):
+        """Метрики в текстовом формате Prometheus."""
+        with self._lock:
+            lines = [
+                '# HELP yanote_requests_total Число запросов.',
+                '# TYPE yanote_requests_total counter',
+            ]
+            for (view, status), count in sorted(self.requests.items()):
+                lines.append(
+                    f'yanote_requests_total{{view="{view}",'
+                    f'status="{status}"}} {count}'
+                )
+            lines += [
+                '# HELP yanote_request_duration_seconds Время ответа.',
+                '# TYPE yanote_request_duration_seconds histogram',
+            ]
+            for view, histogram in sorted(self.latency.items()):
+                lines.extend(histogram.samples(
+                    'yanote_request_duration_seconds', f'view="{view}"'
+                ))
+            lines += [
+                '# HELP yanote_template_render_seconds Время рендеринга.',
+                '# TYPE yanote_template_render_seconds histogram',
+            ]
+            for view, histogram in sorted(self.render.items()):
+                lines.extend(histogram.samples(
+                    'yanote_template_render_seconds', f'view="{view}"'
+                ))
+            lines += [
+                '# HELP yanote_db_queries_total Число запросов к БД.',
+                '# TYPE yanote_db_queries_total counter',
+            ]
+            for view, count in sorted(self.queries.items()):
+                lines.append(
+                    f'yanote_db_queries_total{{view="{view}"}} {count}'
+                )
+            lines += [
+                '# HELP yanote_db_query_seconds_total Время запросов к БД.',
+                '# TYPE yanote_db_query_seconds_total counter',
+            ]
+            for view, seconds in sorted(self.query_seconds.items()):
+                lines.append(
+                    f'yanote_db_query_seconds_total{{view="{view}"}} {seconds}'
+                )
+        cache_stats = notes_cache.stats()
+        lines += [
+            '# HELP yanote_cache_hits_total Попадания в кеш заметок.',
+            '# TYPE yanote_cache_hits_total counter',
+            f'yanote_cache_hits_total {cache_stats["hits"]}',
+            '# HELP yanote_cache_misses_total Промахи кеша заметок.',
+            '# TYPE yanote_cache_misses_total counter',
+            f'yanote_cache_misses_total {cache_stats["misses"]}',
+        ]
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
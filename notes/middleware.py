@@ -0,0 +1,207 @@
+import logging
+import math
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.middleware.gzip import GZipMiddleware as BaseGZipMiddleware
+from django.db import connections
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.functional import SimpleLazyObject
+
+from . import static, throttle
+from .auth import get_cached_user
+from .metrics import QueryCounter, registry
+from .routers import use_primary
+
+logger = logging.getLogger('notes.metrics')
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+class StaticFilesMiddleware:
+    """Отдаёт статику до остальных middleware и view.
+
+    Список файлов собирается один раз при запуске; сжатую копию
+    выбирает Accept-Encoding.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL
+        self.files = static.collect_files()
+
+    def __call__(self, request):
+        path = request.path_info
+        if request.method in ('GET', 'HEAD') and path.startswith(self.prefix):
+            file = self.files.get(path[len(self.prefix):])
+            if file is not None:
+                # Для MetricsMiddleware: у такого запроса нет view.
+                request._static_file = True
+                return static.serve(request, file)
+        return self.get_response(request)
+
+
+class GZipMiddleware(BaseGZipMiddleware):
+    """Сжимает ответы, в том числе потоковые, кроме коротких и сжатых.
+
+    Потоковый ответ сжимается по частям, не собираясь в памяти.
+    """
+
+    def process_response(self, request, response):
+        content_type = response.get('Content-Type', '')
+        if content_type.startswith(settings.NOTES_GZIP_SKIP_TYPES):
+            return response
+        if (not response.streaming
+                and len(response.content) < settings.NOTES_GZIP_MIN_LENGTH):
+            return response
+        return super().process_response(request, response)
+
+
+class PrimaryStickinessMiddleware:
+    """Направляет запросы на основную БД во время записи и сразу после неё.
+
+    После небезопасного запроса клиент получает cookie на
+    REPLICA_PIN_SECONDS секунд: пока она жива, пользователь читает
+    с основной БД и видит свои изменения, даже если реплики отстают.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        writing = request.method not in SAFE_METHODS
+        pinned = writing or settings.REPLICA_PIN_COOKIE in request.COOKIES
+        token = use_primary.set(pinned)
+        try:
+            response = self.get_response(request)
+        finally:
+            use_primary.reset(token)
+        if writing:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """request.user из кеша вместо запроса к auth_user на каждой странице."""
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_cached_user(request))
+
+
+def too_many_requests(wait):
+    response = HttpResponse(
+        'Слишком много запросов на запись, повторите позже.',
+        content_type='text/plain; charset=utf-8',
+        status=429,
+    )
+    response['Retry-After'] = str(max(1, math.ceil(wait)))
+    return response
+
+
+class WriteThrottleMiddleware:
+    """Ограничивает запись в NOTES_THROTTLE_VIEWS.
+
+    Каждый пользователь и IP-адрес тратят токен из своей корзины, а
+    одновременно пишут не больше NOTES_THROTTLE_MAX_WRITERS запросов:
+    SQLite допускает одного писателя, и очередь за блокировкой только
+    задерживает остальных. Сверх лимита - ответ 429 с Retry-After.
+    Состояние общее для процессов сервера и не требует запросов к БД.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def throttled(self, request):
+        if request.method in SAFE_METHODS:
+            return False
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return False
+        return match.view_name in settings.NOTES_THROTTLE_VIEWS
+
+    def __call__(self, request):
+        if not self.throttled(request):
+            return self.get_response(request)
+        wait = throttle.retry_after(request)
+        if wait:
+            return too_many_requests(wait)
+        limit = settings.NOTES_THROTTLE_MAX_WRITERS
+        if limit is None:
+            return self.get_response(request)
+        state = throttle.get_state()
+        slot = state.acquire_writer(
+            limit, settings.NOTES_THROTTLE_WRITER_TIMEOUT
+        )
+        if slot is None:
+            return too_many_requests(1)
+        try:
+            return self.get_response(request)
+        finally:
+            state.release_writer(slot)
+
+
+class MetricsMiddleware:
+    """Время ответа, запросы к БД и рендеринг шаблонов по имени URL.
+
+    Запросы, вышедшие за REQUEST_QUERY_BUDGET или REQUEST_LATENCY_BUDGET,
+    пишутся в лог предупреждением с полями в extra.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(counter)
+                )
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        if match:
+            view = match.view_name
+        elif getattr(request, '_static_file', False):
+            view = 'static'
+        else:
+            view = 'unresolved'
+        registry.record(
+            view, response.status_code, duration, counter.count,
+            counter.seconds, getattr(request, '_render_seconds', None),
+        )
+        if (counter.count > settings.REQUEST_QUERY_BUDGET
+                or duration > settings.REQUEST_LATENCY_BUDGET):
+            logger.warning(
+                'Превышен бюджет запроса: view=%s duration=%.3f queries=%d',
+                view, duration, counter.count,
+                extra={
+                    'view': view,
+                    'path': request.path,
+                    'duration': duration,
+                    'queries': counter.count,
+                    'query_seconds': counter.seconds,
+                },
+            )
+        return response
+
+    def process_template_response(self, request, response):
+        started = time.perf_counter()
+
+        def rendered(response):
+            request._render_seconds = time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
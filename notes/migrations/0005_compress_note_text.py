@@ -0,0 +1,125 @@
+from importlib import import_module
+
+from django.db import migrations
+
+import notes.fields
+
+BATCH_SIZE = 500
+
+search_index = import_module('notes.migrations.0003_note_search_index')
+
+# Индекс читает текст через представление: в таблице он может быть сжат.
+CREATE_SQL = (
+    """
+    CREATE VIEW notes_note_fts_content AS
+    SELECT id, title, note_text(text) AS text, author_id FROM notes_note
+    """,
+    """
+    CREATE VIRTUAL TABLE notes_note_fts USING fts5(
+        title,
+        text,
+        author_id,
+        content='notes_note_fts_content',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER notes_note_fts_ai AFTER INSERT ON notes_note BEGIN
+        INSERT INTO notes_note_fts(rowid, title, text, author_id)
+        VALUES (new.id, new.title, note_text(new.text), new.author_id);
+    END
+    """,
+    """
+    CREATE TRIGGER notes_note_fts_ad AFTER DELETE ON notes_note BEGIN
+        INSERT INTO notes_note_fts(notes_note_fts, rowid, title, text,
+                                   author_id)
+        VALUES ('delete', old.id, old.title, note_text(old.text),
+                old.author_id);
+    END
+    """,
+    """
+    CREATE TRIGGER notes_note_fts_au
+    AFTER UPDATE OF title, text, author_id ON notes_note BEGIN
+        INSERT INTO notes_note_fts(notes_note_fts, rowid, title, text,
+                                   author_id)
+        VALUES ('delete', old.id, old.title, note_text(old.text),
+                old.author_id);
+        INSERT INTO notes_note_fts(rowid, title, text, author_id)
+        VALUES (new.id, new.title, note_text(new.text), new.author_id);
+    END
+    """,
+    "INSERT INTO notes_note_fts(notes_note_fts) VALUES ('rebuild')",
+)
+
+DROP_SQL = search_index.DROP_SQL + (
+    'DROP VIEW IF EXISTS notes_note_fts_content',
+)
+
+
+def rewrite_texts(select_sql, convert):
+    """Переписывает тексты пачками по BATCH_SIZE строк."""
+    def run(apps, schema_editor):
+        connection = schema_editor.connection
+        if connection.vendor != 'sqlite':
+            return
+        last_id = 0
+        with connection.cursor() as cursor:
+            while True:
+                cursor.execute(select_sql, [last_id, BATCH_SIZE])
+                rows = cursor.fetchall()
+                if not rows:
+                    return
+                last_id = rows[-1][0]
+                updates = []
+                for pk, text in rows:
+                    new_text = convert(text, connection)
+                    if new_text != text:
+                        updates.append((new_text, pk))
+                cursor.executemany(
+                    'UPDATE notes_note SET text = %s WHERE id = %s', updates
+                )
+    return run
+
+
+compress_texts = rewrite_texts(
+    "SELECT id, text FROM notes_note WHERE id > %s "
+    "AND typeof(text) = 'text' ORDER BY id LIMIT %s",
+    notes.fields.CompressedTextField().get_db_prep_save,
+)
+decompress_texts = rewrite_texts(
+    "SELECT id, text FROM notes_note WHERE id > %s "
+    "AND typeof(text) = 'blob' ORDER BY id LIMIT %s",
+    lambda text, connection: notes.fields.decompress(text),
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0004_note_updated_at'),
+    ]
+
+    operations = [
+        # Тип колонки не меняется, меняется только класс поля.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='note',
+                    name='text',
+                    field=notes.fields.CompressedTextField(
+                        help_text='Добавьте подробностей',
+                        verbose_name='Текст',
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(
+            search_index.run_sql(search_index.DROP_SQL),
+            search_index.run_sql(search_index.CREATE_SQL),
+        ),
+        migrations.RunPython(compress_texts, decompress_texts),
+        migrations.RunPython(
+            search_index.run_sql(CREATE_SQL), search_index.run_sql(DROP_SQL)
+        ),
+    ]
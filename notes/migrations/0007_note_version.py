@@ -0,0 +1,34 @@
+from importlib import import_module
+
+from django.db import migrations, models
+
+search_index = import_module('notes.migrations.0003_note_search_index')
+compressed = import_module('notes.migrations.0005_compress_note_text')
+
+# SQLite пересоздаёт таблицу при добавлении поля и не даёт переименовать
+# новую таблицу, пока на старую ссылается представление индекса.
+VIEW_SQL = compressed.CREATE_SQL[:1]
+DROP_VIEW_SQL = compressed.DROP_SQL[-1:]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0006_note_revision'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            search_index.run_sql(DROP_VIEW_SQL),
+            search_index.run_sql(VIEW_SQL),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='version',
+            field=models.PositiveIntegerField(default=1, verbose_name='Версия'),
+        ),
+        migrations.RunPython(
+            search_index.run_sql(VIEW_SQL),
+            search_index.run_sql(DROP_VIEW_SQL),
+        ),
+    ]
@@ -0,0 +1,86 @@
+from importlib import import_module
+
+from django.db import migrations, models
+import django.db.models.manager
+
+search_index = import_module('notes.migrations.0003_note_search_index')
+compressed = import_module('notes.migrations.0005_compress_note_text')
+
+# Заметки из корзины не попадают в индекс: представление и триггеры
+# пропускают строки с deleted_at.
+CREATE_SQL = (
+    """
+    CREATE VIEW notes_note_fts_content AS
+    SELECT id, title, note_text(text) AS text, author_id FROM notes_note
+    WHERE deleted_at IS NULL
+    """,
+    compressed.CREATE_SQL[1],
+    """
+    CREATE TRIGGER notes_note_fts_ai
+    AFTER INSERT ON notes_note WHEN new.deleted_at IS NULL BEGIN
+        INSERT INTO notes_note_fts(rowid, title, text, author_id)
+        VALUES (new.id, new.title, note_text(new.text), new.author_id);
+    END
+    """,
+    """
+    CREATE TRIGGER notes_note_fts_ad
+    AFTER DELETE ON notes_note WHEN old.deleted_at IS NULL BEGIN
+        INSERT INTO notes_note_fts(notes_note_fts, rowid, title, text,
+                                   author_id)
+        VALUES ('delete', old.id, old.title, note_text(old.text),
+                old.author_id);
+    END
+    """,
+    """
+    CREATE TRIGGER notes_note_fts_au
+    AFTER UPDATE OF title, text, author_id, deleted_at ON notes_note
+    BEGIN
+        INSERT INTO notes_note_fts(notes_note_fts, rowid, title, text,
+                                   author_id)
+        SELECT 'delete', old.id, old.title, note_text(old.text),
+               old.author_id
+        WHERE old.deleted_at IS NULL;
+        INSERT INTO notes_note_fts(rowid, title, text, author_id)
+        SELECT new.id, new.title, note_text(new.text), new.author_id
+        WHERE new.deleted_at IS NULL;
+    END
+    """,
+    "INSERT INTO notes_note_fts(notes_note_fts) VALUES ('rebuild')",
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0007_note_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            search_index.run_sql(compressed.DROP_SQL),
+            search_index.run_sql(compressed.CREATE_SQL),
+        ),
+        migrations.AlterModelOptions(
+            name='note',
+            options={'default_manager_name': 'all_objects'},
+        ),
+        migrations.AlterModelManagers(
+            name='note',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Дата удаления в корзину'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', False)), fields=['deleted_at'], name='note_deleted_at_idx'),
+        ),
+        migrations.RunPython(
+            search_index.run_sql(CREATE_SQL),
+            search_index.run_sql(compressed.DROP_SQL),
+        ),
+    ]
@@ -0,0 +1,81 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+search_index = import_module('notes.migrations.0003_note_search_index')
+compressed = import_module('notes.migrations.0005_compress_note_text')
+trash = import_module('notes.migrations.0008_note_trash')
+
+BATCH_SIZE = 500
+
+# Представление индекса мешает SQLite пересоздать таблицу заметок.
+VIEW_SQL = trash.CREATE_SQL[:1]
+DROP_VIEW_SQL = compressed.DROP_SQL[-1:]
+
+
+def fill_sizes(apps, schema_editor):
+    """Размеры текстов пачками по BATCH_SIZE заметок."""
+    Note = apps.get_model('notes', 'Note')
+    notes = Note._default_manager.order_by('pk').only('pk', 'text')
+    last_id = 0
+    while True:
+        batch = list(notes.filter(pk__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            return
+        last_id = batch[-1].pk
+        for note in batch:
+            note.size = len(str(note.text).encode())
+        Note._default_manager.bulk_update(batch, ['size'])
+
+
+def fill_stats(apps, schema_editor):
+    Note = apps.get_model('notes', 'Note')
+    NoteStats = apps.get_model('notes', 'NoteStats')
+    NoteStats.objects.bulk_create(
+        NoteStats(
+            user_id=row['author_id'],
+            notes_count=row['count'],
+            notes_size=row['size'],
+        )
+        for row in Note._default_manager.filter(
+            deleted_at__isnull=True
+        ).order_by().values('author_id').annotate(
+            count=models.Count('pk'), size=models.Sum('size')
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notes', '0009_note_tags'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='note_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('notes_count', models.PositiveIntegerField(default=0, verbose_name='Заметок')),
+                ('notes_size', models.PositiveBigIntegerField(default=0, verbose_name='Объём, байт')),
+            ],
+        ),
+        migrations.RunPython(
+            search_index.run_sql(DROP_VIEW_SQL),
+            search_index.run_sql(VIEW_SQL),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='size',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Размер текста, байт'),
+        ),
+        migrations.RunPython(
+            search_index.run_sql(VIEW_SQL),
+            search_index.run_sql(DROP_VIEW_SQL),
+        ),
+        migrations.RunPython(fill_sizes, migrations.RunPython.noop),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,163 @@
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Coalesce
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
 
-from pytils.translit import slugify
+from .cache import bump_version, bump_versions
+from .fields import CompressedText, CompressedTextField
+from .markup import cached_markdown
+from .slugs import allocate_slug
+
+SLUG_ATTEMPTS = 3
+
+
+def text_size(text):
+    """Размер текста в байтах UTF-8: его учитывают статистика и квоты."""
+    return len(str(text).encode())
+
+
+def stats_delta(after, before):
+    """Разница статистик {author_id: (count, size)}."""
+    return {
+        author_id: (
+            after.get(author_id, (0, 0))[0] - before.get(author_id, (0, 0))[0],
+            after.get(author_id, (0, 0))[1] - before.get(author_id, (0, 0))[1],
+        )
+        for author_id in after.keys() | before.keys()
+    }
+
+
+def write_db(queryset):
+    """Алиас записи для queryset, как у его update() и delete().
+
+    Без этого self.db до записи - алиас чтения, то есть реплика: на ней
+    открылась бы транзакция и считались бы изменения статистики.
+    Признак копируется в производные queryset, их чтение тоже идёт туда.
+    """
+    queryset._for_write = True
+    return queryset.db
+
+
+class NoteQuerySet(models.QuerySet):
+    """Массовые операции тоже сбрасывают кеш затронутых авторов."""
+
+    def _author_ids(self):
+        return list(self.order_by().values_list('author_id', flat=True)
+                    .distinct())
+
+    def _tag_ids(self):
+        return list(NoteTag.objects.using(self.db).filter(
+            note__in=self.order_by().values('pk')
+        ).values_list('tag_id', flat=True).distinct())
+
+    def _stats(self):
+        """Число и объём заметок выборки по авторам."""
+        return {
+            row['author_id']: (row['count'], row['size'] or 0)
+            for row in self.order_by().values('author_id').annotate(
+                count=models.Count('pk'), size=models.Sum('size')
+            )
+        }
+
+    def _stats_changes(self, values):
+        """Как update(**values) изменит статистику авторов."""
+        size = values.get('size')
+        if 'deleted_at' not in values and not isinstance(size, int):
+            return {}
+        before = after = self.filter(deleted_at__isnull=True)._stats()
+        if 'deleted_at' in values:
+            after = {} if values['deleted_at'] else self._stats()
+        if isinstance(size, int):
+            after = {
+                author_id: (count, count * size)
+                for author_id, (count, _) in after.items()
+            }
+        return stats_delta(after, before)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        added = {}
+        for obj in objs:
+            obj.size = text_size(obj.text)
+            if obj.deleted_at is None:
+                count, size = added.get(obj.author_id, (0, 0))
+                added[obj.author_id] = (count + 1, size + obj.size)
+        db = write_db(self)
+        with transaction.atomic(using=db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            NoteStats.objects.using(db).add(added)
+        bump_versions({obj.author_id for obj in objs})
+        return objs
+
+    def update(self, **kwargs):
+        kwargs.setdefault('updated_at', timezone.now())
+        kwargs.setdefault('version', models.F('version') + 1)
+        if isinstance(kwargs.get('text'), str):
+            kwargs.setdefault('size', text_size(kwargs['text']))
+        db = write_db(self)
+        author_ids = self._author_ids()
+        changes = self._stats_changes(kwargs)
+        with transaction.atomic(using=db):
+            rows = super().update(**kwargs)
+            NoteStats.objects.using(db).add(changes)
+        bump_versions(author_ids)
+        return rows
+
+    def delete(self):
+        db = write_db(self)
+        author_ids = self._author_ids()
+        tag_ids = self._tag_ids()
+        removed = self.filter(deleted_at__isnull=True)._stats()
+        with transaction.atomic(using=db):
+            result = super().delete()
+            NoteStats.objects.using(db).add(stats_delta({}, removed))
+        Tag.objects.using(db).filter(pk__in=tag_ids).refresh_counts()
+        bump_versions(author_ids)
+        return result
+
+    def _set_deleted_at(self, deleted_at):
+        db = write_db(self)
+        tag_ids = self._tag_ids()
+        rows = self.update(deleted_at=deleted_at)
+        Tag.objects.using(db).filter(pk__in=tag_ids).refresh_counts()
+        return rows
+
+    def trash(self):
+        """Переносит заметки в корзину одним UPDATE."""
+        return self._set_deleted_at(timezone.now())
+
+    def restore(self):
+        return self._set_deleted_at(None)
+
+    def purge(self):
+        """Удаляет заметки и связанные записи без загрузки строк.
+
+        В отличие от delete() строки не читаются в Python для каскада:
+        связанные таблицы и сами заметки очищаются по одному DELETE.
+        """
+        db = write_db(self)
+        author_ids = self._author_ids()
+        tag_ids = self._tag_ids()
+        removed = self.filter(deleted_at__isnull=True)._stats()
+        note_ids = self.values('pk')
+        with transaction.atomic(using=db):
+            for relation in self.model._meta.related_objects:
+                relation.related_model._base_manager.using(db).filter(
+                    **{f'{relation.field.name}__in': note_ids}
+                )._raw_delete(db)
+            rows = self._raw_delete(db)
+            Tag.objects.using(db).filter(pk__in=tag_ids).refresh_counts()
+            NoteStats.objects.using(db).add(stats_delta({}, removed))
+        bump_versions(author_ids)
+        return rows
+
+
+class NoteManager(models.Manager.from_queryset(NoteQuerySet)):
+    """Заметки, кроме лежащих в корзине."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
 
 
 class Note(models.Model):
@@ -11,7 +167,7 @@ class Note(models.Model):
         default='Название заметки',
         help_text='Дайте короткое название заметке'
     )
-    text = models.TextField(
+    text = CompressedTextField(
         'Текст',
         help_text='Добавьте подробностей'
     )
@@ -27,12 +183,372 @@ class Note(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
+    version = models.PositiveIntegerField('Версия', default=1)
+    deleted_at = models.DateTimeField(
+        'Дата удаления в корзину', null=True, blank=True
+    )
+    size = models.PositiveIntegerField(
+        'Размер текста, байт', default=0, editable=False
+    )
+    tags = models.ManyToManyField(
+        'Tag', through='NoteTag', related_name='notes', blank=True,
+        verbose_name='Метки',
+    )
+
+    objects = NoteManager()
+    all_objects = NoteQuerySet.as_manager()
+
+    class Meta:
+        # Проверка уникальности slug должна видеть и заметки в корзине.
+        default_manager_name = 'all_objects'
+        indexes = (
+            models.Index(
+                fields=('author', 'id'),
+                name='note_author_id_idx',
+            ),
+            models.Index(
+                fields=('deleted_at',),
+                name='note_deleted_at_idx',
+                condition=models.Q(deleted_at__isnull=False),
+            ),
+        )
 
     def __str__(self):
         return self.title
 
+    def html(self):
+        """Текст заметки в HTML из Markdown."""
+        return cached_markdown(self.text)
+
     def save(self, *args, **kwargs):
-        if not self.slug:
-            max_slug_length = self._meta.get_field('slug').max_length
-            self.slug = slugify(self.title)[:max_slug_length]
-        super().save(*args, **kwargs)
+        adding = self._state.adding
+        if not adding:
+            self.version += 1
+        # Непрочитанный сжатый текст не менялся, размер прежний.
+        if not isinstance(self.__dict__.get('text'), CompressedText):
+            self.size = text_size(self.text)
+        with transaction.atomic():
+            before = {} if adding else Note.objects.filter(pk=self.pk)._stats()
+            if self.slug:
+                super().save(*args, **kwargs)
+            else:
+                self._save_with_new_slug(*args, **kwargs)
+            after = {} if self.deleted_at else {self.author_id: (1, self.size)}
+            NoteStats.objects.add(stats_delta(after, before))
+        bump_version(self.author_id)
+
+    def _save_with_new_slug(self, *args, **kwargs):
+        """Сохраняет заметку со свободным slug из заголовка.
+
+        Параллельная запись может занять тот же slug между выбором и
+        INSERT; тогда slug выбирается заново.
+        """
+        max_length = self._meta.get_field('slug').max_length
+        for attempt in range(SLUG_ATTEMPTS):
+            self.slug = allocate_slug(
+                Note.all_objects.exclude(pk=self.pk), self.title,
+                max_length=max_length,
+            )
+            try:
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                return
+            except IntegrityError:
+                if attempt == SLUG_ATTEMPTS - 1:
+                    raise
+
+    def save_changed(self, fields, version):
+        """Записывает поля fields одним UPDATE, если версия не изменилась.
+
+        Возвращает False, если заметку уже изменили после чтения version.
+        Пустой slug подбирается из заголовка, как при save().
+        """
+        new_slug = 'slug' in fields and not self.slug
+        updated_at = timezone.now()
+        for attempt in range(SLUG_ATTEMPTS):
+            if new_slug:
+                self.slug = allocate_slug(
+                    Note.all_objects.exclude(pk=self.pk), self.title,
+                    max_length=self._meta.get_field('slug').max_length,
+                )
+            values = {name: getattr(self, name) for name in fields}
+            if 'text' in values:
+                values['size'] = text_size(self.text)
+            try:
+                with transaction.atomic():
+                    # Обычный update() читал бы авторов для сброса кеша.
+                    rows = models.QuerySet.update(
+                        Note.objects.filter(pk=self.pk, version=version),
+                        updated_at=updated_at,
+                        version=models.F('version') + 1,
+                        **values,
+                    )
+                    # Размер прочитан в той же версии, разница точная.
+                    if rows and 'size' in values:
+                        NoteStats.objects.add({
+                            self.author_id: (0, values['size'] - self.size)
+                        })
+                break
+            except IntegrityError:
+                if not new_slug or attempt == SLUG_ATTEMPTS - 1:
+                    raise
+        if not rows:
+            return False
+        self.version = version + 1
+        self.updated_at = updated_at
+        self.size = values.get('size', self.size)
+        bump_version(self.author_id)
+        return True
+
+    def tag_names(self):
+        return [tag.name for tag in self.tags.all()]
+
+    def set_tags(self, names):
+        """Заменяет метки заметки и пересчитывает счётчики изменённых."""
+        tags = Tag.objects.filter(author_id=self.author_id, name__in=names)
+        missing = set(names) - set(tags.values_list('name', flat=True))
+        Tag.objects.bulk_create(
+            (Tag(author_id=self.author_id, name=name) for name in missing),
+            ignore_conflicts=True,
+        )
+        new_ids = set(tags.values_list('id', flat=True))
+        old_ids = set(self.notetag_set.values_list('tag_id', flat=True))
+        with transaction.atomic():
+            self.notetag_set.filter(tag_id__in=old_ids - new_ids).delete()
+            NoteTag.objects.bulk_create(
+                (NoteTag(note=self, tag_id=pk) for pk in new_ids - old_ids),
+                ignore_conflicts=True,
+            )
+            Tag.objects.filter(pk__in=old_ids ^ new_ids).refresh_counts()
+            if old_ids != new_ids:
+                # Метки выводятся на странице заметки, а её ETag и
+                # Last-Modified строятся по updated_at.
+                self.updated_at = timezone.now()
+                models.QuerySet.update(
+                    Note.all_objects.filter(pk=self.pk),
+                    updated_at=self.updated_at,
+                )
+        bump_version(self.author_id)
+
+    def delete(self, *args, **kwargs):
+        tag_ids = list(self.notetag_set.values_list('tag_id', flat=True))
+        with transaction.atomic():
+            removed = Note.objects.filter(pk=self.pk)._stats()
+            result = super().delete(*args, **kwargs)
+            NoteStats.objects.add(stats_delta({}, removed))
+        Tag.objects.filter(pk__in=tag_ids).refresh_counts()
+        bump_version(self.author_id)
+        return result
+
+
+class TagQuerySet(models.QuerySet):
+
+    def refresh_counts(self):
+        """Пересчитывает notes_count одним UPDATE по индексу NoteTag.
+
+        Считаются только заметки выбранных меток, а не вся таблица.
+        """
+        counts = NoteTag.objects.filter(
+            tag=models.OuterRef('pk'), note__deleted_at__isnull=True
+        ).order_by().values('tag').annotate(
+            count=models.Count('*')
+        ).values('count')
+        return self.update(
+            notes_count=Coalesce(models.Subquery(counts), 0)
+        )
+
+
+class Tag(models.Model):
+    """Метка пользователя."""
+
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='tags',
+    )
+    name = models.CharField('Название', max_length=50)
+    # Число заметок вне корзины: боковой панели не нужен GROUP BY.
+    notes_count = models.PositiveIntegerField('Заметок', default=0)
+
+    objects = TagQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('name',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('author', 'name'), name='tag_author_name_uniq'
+            ),
+        )
+
+    def __str__(self):
+        return self.name
+
+
+class NoteTag(models.Model):
+    """Связь заметки и метки."""
+
+    note = models.ForeignKey(Note, on_delete=models.CASCADE, db_index=False)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, db_index=False)
+
+    class Meta:
+        # Оба индекса покрывающие: (tag, note) - для списка по метке,
+        # (note, tag) - для загрузки меток страницы заметок.
+        constraints = (
+            models.UniqueConstraint(
+                fields=('tag', 'note'), name='note_tag_uniq'
+            ),
+        )
+        indexes = (
+            models.Index(fields=('note', 'tag'), name='note_tag_note_idx'),
+        )
+
+
+class NoteStatsQuerySet(models.QuerySet):
+
+    def add(self, changes):
+        """Прибавляет changes {author_id: (count, size)} к счётчикам.
+
+        Вызывается после записи заметок в той же транзакции. Если строки
+        автора ещё нет, она считается заново и уже учитывает запись.
+        """
+        for author_id, (count, size) in changes.items():
+            if not (count or size):
+                continue
+            rows = self.filter(user_id=author_id).update(
+                notes_count=models.F('notes_count') + count,
+                notes_size=models.F('notes_size') + size,
+            )
+            if not rows:
+                self.rebuild([author_id])
+
+    def rebuild(self, author_ids):
+        """Пересчитывает статистику авторов по их заметкам."""
+        author_ids = list(author_ids)
+        db = write_db(self)
+        with transaction.atomic(using=db):
+            # Сначала запись: SQLite берёт блокировку до подсчёта, и
+            # параллельные изменения не потеряются.
+            self.filter(user_id__in=author_ids).delete()
+            totals = Note.objects.using(db).filter(
+                author_id__in=author_ids
+            )._stats()
+            self.bulk_create(
+                NoteStats(
+                    user_id=author_id,
+                    notes_count=totals.get(author_id, (0, 0))[0],
+                    notes_size=totals.get(author_id, (0, 0))[1],
+                )
+                for author_id in author_ids
+            )
+
+    def quota_error(self, author_id, count=0, size=0):
+        """Текст ошибки, если изменение превысит квоту автора."""
+        notes_count, notes_size = self.filter(user_id=author_id).values_list(
+            'notes_count', 'notes_size'
+        ).first() or (0, 0)
+        max_notes = settings.NOTES_QUOTA_NOTES
+        if count > 0 and max_notes is not None and (
+            notes_count + count > max_notes
+        ):
+            return f'Достигнут предел: {max_notes} заметок.'
+        max_size = settings.NOTES_QUOTA_BYTES
+        if size > 0 and max_size is not None and (
+            notes_size + size > max_size
+        ):
+            return (
+                'Заметки займут больше '
+                f'{filesizeformat(max_size)}, сократите текст.'
+            )
+        return None
+
+
+class NoteStats(models.Model):
+    """Число заметок автора вне корзины и объём их текстов.
+
+    Меняется в одной транзакции с заметками, поэтому шапке и квотам
+    достаточно прочитать одну строку.
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='note_stats',
+    )
+    notes_count = models.PositiveIntegerField('Заметок', default=0)
+    notes_size = models.PositiveBigIntegerField('Объём, байт', default=0)
+
+    objects = NoteStatsQuerySet.as_manager()
+
+    def __str__(self):
+        return f'{self.user_id}: {self.notes_count}'
+
+
+class NoteRevision(models.Model):
+    """Версия заметки: снимок текста или разница с предыдущей версией."""
+
+    note = models.ForeignKey(
+        Note, on_delete=models.CASCADE, related_name='revisions'
+    )
+    number = models.PositiveIntegerField('Номер версии')
+    title = models.CharField('Заголовок', max_length=100)
+    is_snapshot = models.BooleanField('Полный текст', default=False)
+    data = CompressedTextField('Текст или разница')
+    created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+
+    class Meta:
+        ordering = ('-number',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('note', 'number'), name='note_revision_number_uniq'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.note_id}/{self.number}'
+
+
+class Job(models.Model):
+    """Фоновая задача: вызов функции по её пути после ответа пользователю.
+
+    Задачи с одинаковым key не дублируются, пока ждут выполнения. Задачи
+    одной группы group выполняются по очереди в порядке добавления.
+    """
+
+    name = models.CharField('Функция', max_length=200)
+    args = models.TextField('Аргументы JSON', default='[]')
+    key = models.CharField(
+        'Ключ', max_length=200, null=True, blank=True
+    )
+    group = models.CharField('Группа', max_length=200, blank=True)
+    run_at = models.DateTimeField('Запустить после', default=timezone.now)
+    locked_until = models.DateTimeField('Занята до', null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    failed_at = models.DateTimeField('Дата отказа', null=True, blank=True)
+    error = models.TextField('Ошибка', blank=True)
+
+    class Meta:
+        ordering = ('run_at', 'id')
+        indexes = (
+            models.Index(
+                fields=('run_at',),
+                condition=models.Q(failed_at__isnull=True),
+                name='job_run_at_idx',
+            ),
+            models.Index(
+                fields=('group', 'id'),
+                condition=~models.Q(group=''),
+                name='job_group_idx',
+            ),
+        )
+        constraints = (
+            models.UniqueConstraint(
+                fields=('key',),
+                condition=models.Q(failed_at__isnull=True),
+                name='job_key_uniq',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.pk}: {self.name}'
@@ -0,0 +1,81 @@
+from django.http import Http404
+
+
+class KeysetPage:
+    """Страница выборки, полученная по ключу, а не по смещению."""
+
+    def __init__(self, object_list, has_next, has_previous,
+                 next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+
+class KeysetPaginator:
+    """Постраничный вывод по возрастанию id без OFFSET.
+
+    Курсор - это id граничной заметки: after для следующей страницы,
+    before для предыдущей. Сначала по индексу (author, id) выбираются
+    только id страницы, затем строки загружаются одним диапазоном,
+    поэтому стоимость страницы не зависит от числа заметок.
+    """
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = per_page
+
+    @staticmethod
+    def parse_cursor(value):
+        """Преобразует курсор из GET-параметра, иначе 404."""
+        if value in (None, ''):
+            return None
+        try:
+            cursor = int(value)
+        except (TypeError, ValueError):
+            raise Http404('Некорректный курсор страницы.')
+        if cursor < 0:
+            raise Http404('Некорректный курсор страницы.')
+        return cursor
+
+    def get_page(self, after=None, before=None):
+        ids = self.queryset.order_by().values_list('id', flat=True)
+        if before is not None:
+            ids = list(ids.filter(id__lt=before).order_by('-id')[
+                :self.per_page + 1
+            ])
+            has_previous = len(ids) > self.per_page
+            ids = sorted(ids[:self.per_page])
+            has_next = True
+        else:
+            if after is not None:
+                ids = ids.filter(id__gt=after)
+            ids = list(ids.order_by('id')[:self.per_page + 1])
+            has_next = len(ids) > self.per_page
+            ids = ids[:self.per_page]
+            has_previous = after is not None
+        if not ids:
+            return KeysetPage(
+                self.queryset.none(), False, has_previous,
+                previous_cursor=after + 1 if has_previous else None,
+            )
+        object_list = self.queryset.filter(
+            id__range=(ids[0], ids[-1])
+        ).order_by('id')
+        return KeysetPage(
+            object_list,
+            has_next,
+            has_previous,
+            next_cursor=ids[-1] if has_next else None,
+            previous_cursor=ids[0] if has_previous else None,
+        )
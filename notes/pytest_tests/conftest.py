@@ -1,9 +1,30 @@
 import pytest
+from django.core.cache import cache
 from django.test.client import Client
 
 from notes.models import Note
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # Кеш живёт дольше тестовой базы, поэтому очищаем его перед каждым тестом.
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def throttle_file(settings, tmp_path):
+    # Корзины токенов общие для процессов, поэтому у каждого теста свой файл.
+    settings.NOTES_THROTTLE_FILE = str(tmp_path / "throttle")
+
+
+@pytest.fixture(autouse=True)
+def shared_cache(settings, tmp_path):
+    # Общий кеш сессий лежит в файлах: у каждого теста свой каталог.
+    settings.CACHES = {**settings.CACHES, "shared": {
+        **settings.CACHES["shared"], "LOCATION": str(tmp_path / "cache"),
+    }}
+
+
 @pytest.fixture
 # Используем встроенную фикстуру для модели пользователей django_user_model.
 def author(django_user_model):
@@ -52,3 +73,17 @@ def slug_for_args(note):
 @pytest.fixture
 def form_data():
     return {"title": "Новый заголовок", "text": "Новый текст", "slug": "new-slug"}
+
+
+@pytest.fixture
+def many_notes(author):
+    # Заметки создаются одним запросом, без вызова save().
+    return Note.objects.bulk_create(
+        Note(
+            title=f"Заметка {index}",
+            text="Текст",
+            slug=f"note-{index}",
+            author=author,
+        )
+        for index in range(15)
+    )
@@ -1,7 +1,10 @@
+from http import HTTPStatus
+
 import pytest
 from django.urls import reverse
 
 from notes.forms import NoteForm
+from notes.views import NotesList
 
 
 @pytest.mark.parametrize(
@@ -47,3 +50,30 @@ def test_pages_contains_form(author_client, name, args):
     assert "form" in response.context
     # Проверяем, что объект формы относится к нужному классу.
     assert isinstance(response.context["form"], NoteForm)
+
+
+def test_notes_list_keyset_pagination(author_client, many_notes, monkeypatch):
+    # Уменьшаем размер страницы, чтобы хватило пятнадцати заметок.
+    monkeypatch.setattr(NotesList, "paginate_by", 10)
+    url = reverse("notes:list")
+    response = author_client.get(url)
+    page = response.context["page_obj"]
+    first_page = list(response.context["object_list"])
+    assert len(first_page) == 10
+    assert page.has_next() and not page.has_previous()
+    # Переходим на следующую страницу по курсору.
+    response = author_client.get(url, {"after": page.next_cursor})
+    page = response.context["page_obj"]
+    second_page = list(response.context["object_list"])
+    assert len(second_page) == 5
+    assert not page.has_next() and page.has_previous()
+    # Курсор "назад" возвращает ровно первую страницу.
+    response = author_client.get(url, {"before": page.previous_cursor})
+    assert list(response.context["object_list"]) == first_page
+    # Текст заметок в список не загружается.
+    assert "text" in first_page[0].get_deferred_fields()
+
+
+def test_notes_list_invalid_cursor(author_client):
+    response = author_client.get(reverse("notes:list"), {"after": "abc"})
+    assert response.status_code == HTTPStatus.NOT_FOUND
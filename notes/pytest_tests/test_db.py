@@ -0,0 +1,98 @@
+import sqlite3
+
+import pytest
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.http import HttpResponse
+
+from notes.db import TUNED_PRAGMAS, apply_sqlite_pragmas
+from notes.middleware import PrimaryStickinessMiddleware
+from notes.models import Note, NoteStats
+from notes.routers import PrimaryReplicaRouter
+
+
+# PRAGMA synchronous нельзя менять внутри транзакции теста.
+@pytest.mark.django_db(transaction=True)
+def test_tuned_sqlite_pragmas(settings):
+    settings.SQLITE_TUNED = True
+    apply_sqlite_pragmas(sender=None, connection=connection)
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA busy_timeout")
+        assert cursor.fetchone()[0] == TUNED_PRAGMAS["busy_timeout"]
+        cursor.execute("PRAGMA synchronous")
+        # Значение 1 соответствует режиму NORMAL.
+        assert cursor.fetchone()[0] == 1
+
+
+@pytest.mark.django_db
+def test_tuned_pragmas_on_read_only_replica(settings, tmp_path):
+    settings.SQLITE_TUNED = True
+    path = tmp_path / "replica.sqlite3"
+    with sqlite3.connect(path) as source:
+        source.execute("CREATE TABLE notes (title TEXT)")
+        source.execute("INSERT INTO notes VALUES ('Заметка')")
+    source.close()
+    # Реплика настроена так же, как в settings.py для YANOTE_DB_REPLICAS.
+    replica = DatabaseWrapper({
+        **connection.settings_dict,
+        "NAME": f"file:{path}?mode=ro",
+        "OPTIONS": {"uri": True},
+    }, alias="replica1")
+    try:
+        with replica.cursor() as cursor:
+            cursor.execute("SELECT title FROM notes")
+            assert cursor.fetchall() == [("Заметка",)]
+            cursor.execute("PRAGMA busy_timeout")
+            assert cursor.fetchone()[0] == TUNED_PRAGMAS["busy_timeout"]
+            cursor.execute("PRAGMA journal_mode")
+            assert cursor.fetchone()[0] != "wal"
+    finally:
+        replica.close()
+
+
+def test_router_reads_from_replica_until_user_writes(settings, rf):
+    settings.DATABASE_REPLICAS = ["replica1"]
+    router = PrimaryReplicaRouter()
+    used = {}
+
+    def view(request):
+        used[request.method] = router.db_for_read(Note)
+        return HttpResponse()
+
+    middleware = PrimaryStickinessMiddleware(view)
+    middleware(rf.get("/"))
+    response = middleware(rf.post("/"))
+    assert used == {"GET": "replica1", "POST": "default"}
+    assert router.db_for_write(Note) == "default"
+    # Сразу после записи чтение идёт с основной БД.
+    request = rf.get("/")
+    request.COOKIES[settings.REPLICA_PIN_COOKIE] = response.cookies[
+        settings.REPLICA_PIN_COOKIE
+    ].value
+    middleware(request)
+    assert used["GET"] == "default"
+
+
+@pytest.fixture
+def missing_replica(monkeypatch):
+    # Чтение уходит на алиас, которого нет: любое обращение к нему
+    # вместо основной базы вызовет ConnectionDoesNotExist.
+    monkeypatch.setattr(
+        PrimaryReplicaRouter, "db_for_read", lambda *args, **hints: "replica"
+    )
+
+
+def test_purge_writes_to_primary(note, missing_replica):
+    Note.all_objects.filter(pk=note.pk).purge()
+    assert not Note.all_objects.using("default").exists()
+
+
+def test_bulk_writes_use_primary(author, note, missing_replica):
+    notes = Note.objects.filter(pk=note.pk)
+    notes.update(title="Новый")
+    notes.trash()
+    Note.all_objects.filter(pk=note.pk).restore()
+    Note.objects.bulk_create([Note(title="Ещё", text="Текст", author=author)])
+    NoteStats.objects.rebuild([author.pk])
+    Note.objects.filter(title="Ещё").delete()
+    assert NoteStats.objects.using("default").get(user=author).notes_count == 1
@@ -0,0 +1,21 @@
+import pytest
+
+from notes.jobs import enqueue, run_workers
+from notes.markup import render_markdown
+from notes.models import Job
+
+
+@pytest.mark.django_db
+def test_jobs_are_deduplicated_and_retried(settings):
+    settings.NOTES_JOBS_MAX_ATTEMPTS = 2
+    settings.NOTES_JOBS_RETRY_DELAY = 0
+    enqueue(render_markdown, "Текст", key="markdown")
+    enqueue(render_markdown, "Другой текст", key="markdown")
+    assert Job.objects.count() == 1
+    Job.objects.create(name="notes.missing.task")
+    assert run_workers(once=True) == 3
+    # Упавшая задача повторена и после последней попытки осталась в таблице.
+    failed = Job.objects.get()
+    assert failed.attempts == 2
+    assert failed.failed_at is not None
+    assert "notes.missing" in failed.error
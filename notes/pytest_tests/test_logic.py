@@ -1,11 +1,30 @@
+import io
+import json
+import time
+import warnings
+import zipfile
+from datetime import timedelta
 from http import HTTPStatus
 from pytest_django.asserts import assertRedirects, assertFormError
 import pytest
 from pytils.translit import slugify
+from django.core.cache.backends.base import CacheKeyWarning
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
 
-from notes.models import Note
+from notes.cache import stats as cache_stats
+from notes.fields import CompressedText
+from notes.models import Job, Note, NoteQuerySet, NoteStats
 from notes.forms import WARNING
+from notes.jobs import run_workers
+from notes.revisions import revision_text
+from notes.search import deferred_index
+from notes.slugs import SlugAllocator
+from notes.trash import purge_trash
 
 
 # Указываем фикстуру form_data в параметрах теста.
@@ -118,3 +137,613 @@ def test_other_user_cant_delete_note(
     response = not_author_client.post(url)
     assert response.status_code == HTTPStatus.NOT_FOUND
     assert Note.objects.count() == 1
+
+
+def search(client, query):
+    response = client.get(reverse("notes:search"), {"q": query})
+    return response.context["object_list"]
+
+
+def test_search_finds_only_own_notes(author_client, not_author_client, note):
+    # Поиск работает по словам из текста без учёта регистра.
+    assert search(author_client, "ТЕКСТ") == [note]
+    assert search(not_author_client, "текст") == []
+
+
+def test_search_index_follows_edit_and_delete(author_client, note, form_data):
+    author_client.post(reverse("notes:edit", args=(note.slug,)), form_data)
+    assert search(author_client, "заметки") == []
+    assert search(author_client, "Новый") == [note]
+    author_client.post(reverse("notes:delete", args=(form_data["slug"],)))
+    assert search(author_client, "Новый") == []
+
+
+def test_search_query_syntax_is_escaped(author_client, note):
+    # Операторы FTS5 в запросе воспринимаются как обычные слова.
+    assert search(author_client, 'Текст" OR author_id:*') == []
+
+
+def test_notes_list_cache_invalidated_on_write(author_client, note, form_data):
+    url = reverse("notes:list")
+    author_client.get(url)
+    hits = cache_stats()["hits"]
+    # Повторный запрос берёт из кеша страницу, метки и статистику шапки.
+    response = author_client.get(url)
+    assert cache_stats()["hits"] == hits + 3
+    assert list(response.context["object_list"]) == [note]
+    # Создание заметки меняет версию автора, и страница строится заново.
+    author_client.post(reverse("notes:add"), data=form_data)
+    response = author_client.get(url)
+    assert response.context["object_list"].count() == 2
+
+
+def test_note_detail_cache_invalidated_on_bulk_update(author_client, note):
+    url = reverse("notes:detail", args=(note.slug,))
+    author_client.get(url)
+    Note.objects.filter(author=note.author).update(title="Обновлено")
+    response = author_client.get(url)
+    assert response.context["note"].title == "Обновлено"
+
+
+@pytest.mark.parametrize(
+    "name, args",
+    (
+        ("notes:detail", pytest.lazy_fixture("slug_for_args")),
+        ("notes:list", None),
+    ),
+)
+def test_conditional_get(author_client, note, form_data, name, args):
+    url = reverse(name, args=args)
+    response = author_client.get(url)
+    etag = response["ETag"]
+    # Клиент с актуальным ETag получает 304 без тела.
+    response = author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert response.content == b""
+    # После изменения заметки ETag устаревает.
+    Note.objects.filter(id=note.id).update(title=form_data["title"])
+    response = author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_list_etag_follows_csrf_token(author_client, note, settings):
+    url = reverse("notes:list")
+    etag = author_client.get(url)["ETag"]
+    response = author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    # После нового входа токен другой, и страницу с формой нужно обновить.
+    author_client.cookies[settings.CSRF_COOKIE_NAME] = "a" * 64
+    response = author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_note_detail_etag_follows_tags(author_client, note):
+    url = reverse("notes:detail", args=(note.slug,))
+    etag = author_client.get(url)["ETag"]
+    # Правка только меток не меняет текст, но меняет страницу.
+    author_client.post(reverse("notes:edit", args=(note.slug,)), {
+        "title": note.title, "text": note.text, "slug": note.slug,
+        "tags": "Дом",
+    })
+    response = author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+    assert "Дом" in response.content.decode()
+
+
+def test_note_detail_etag_follows_stats(author_client, note, form_data):
+    url = reverse("notes:detail", args=(note.slug,))
+    etag = author_client.get(url)["ETag"]
+    # Новая заметка меняет счётчики в шапке каждой страницы автора.
+    author_client.post(reverse("notes:add"), form_data)
+    response = author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+    assert "заметок 2," in response.content.decode()
+
+
+def test_note_detail_if_modified_since(author_client, note, form_data):
+    url = reverse("notes:detail", args=(note.slug,))
+    response = author_client.get(url)
+    assert not response.has_header("Last-Modified")
+    since = http_date(time.time() + 60)
+    author_client.post(reverse("notes:add"), form_data)
+    # Только If-Modified-Since не даёт 304 со старыми счётчиками в шапке.
+    response = author_client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+    assert response.status_code == HTTPStatus.OK
+    assert "заметок 2," in response.content.decode()
+
+
+def test_import_notes_jsonl(author, note, tmp_path):
+    path = tmp_path / "notes.jsonl"
+    records = (
+        {"title": "Список покупок", "text": "Молоко"},
+        {"title": "Список покупок", "text": "Хлеб"},
+        {"title": "Своя", "text": "Текст", "slug": note.slug},
+        {"title": "Чужая", "text": "Текст", "slug": "bad slug/x"},
+    )
+    path.write_text(
+        "\n".join(json.dumps(record) for record in records),
+        encoding="utf-8",
+    )
+    call_command("import_notes", str(path), author=author.username,
+                 batch_size=2, stdout=io.StringIO())
+    slugs = set(Note.objects.values_list("slug", flat=True))
+    # Совпадающие slug получают суффиксы, а не ошибку уникальности.
+    expected = slugify("Список покупок")
+    # Недопустимый slug заменяется slug из заголовка.
+    assert slugs == {
+        note.slug, expected, f"{expected}-2", f"{note.slug}-2",
+        slugify("Чужая"),
+    }
+    assert Note.objects.filter(author=author).count() == 5
+
+
+def test_import_notes_csv_resume(author, tmp_path):
+    path = tmp_path / "notes.csv"
+    path.write_text(
+        "title,text\nПервая,Один\nВторая,Два\nТретья,Три\n",
+        encoding="utf-8",
+    )
+    # Продолжаем импорт после двух уже загруженных записей.
+    call_command("import_notes", str(path), author=author.username,
+                 skip=2, stdout=io.StringIO())
+    assert list(Note.objects.values_list("title", flat=True)) == ["Третья"]
+
+
+def test_export_jsonl(author_client, not_author_client, note):
+    url = reverse("notes:export")
+    response = author_client.get(url, {"format": "jsonl"})
+    # Ответ потоковый: тело собирается из частей.
+    assert response.streaming
+    lines = b"".join(response.streaming_content).decode().splitlines()
+    assert [json.loads(line)["slug"] for line in lines] == [note.slug]
+    response = not_author_client.get(url, {"format": "jsonl"})
+    assert b"".join(response.streaming_content) == b""
+
+
+def test_export_zip(author_client, note):
+    response = author_client.get(reverse("notes:export"), {"format": "zip"})
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+    assert archive.namelist() == [f"{note.slug}.md"]
+    assert note.text in archive.read(f"{note.slug}.md").decode()
+
+
+def test_export_notes_command(author, note, tmp_path):
+    path = tmp_path / "notes.jsonl"
+    call_command("export_notes", author=author.username, output=str(path))
+    assert json.loads(path.read_text(encoding="utf-8"))["text"] == note.text
+
+
+def test_seed_command(client, author_client, note):
+    def seed(prefix):
+        call_command("seed", users=2, notes=30, seed=7, prefix=prefix,
+                     distribution="pareto", stdout=io.StringIO())
+        return list(Note.objects.filter(
+            author__username__startswith=f"{prefix}-"
+        ).order_by("id").values_list("title", "text", "slug"))
+
+    first, second = seed("a"), seed("b")
+    assert len(first) == 60
+    # Одинаковый seed даёт те же тексты, slug получают следующие суффиксы.
+    assert [row[:2] for row in first] == [row[:2] for row in second]
+    for title, _, slug in first:
+        assert slug.startswith(slugify(title))
+    assert len({slug for *_, slug in first + second}) == 120
+    # Поисковый индекс учитывает и старые, и новые заметки.
+    assert search(author_client, "Текст") == [note]
+    seeded = Note.objects.filter(author__username="a-1").first()
+    client.force_login(seeded.author)
+    assert seeded in search(client, seeded.title)
+
+
+def test_deferred_index_keeps_other_writes(author_client, note):
+    # Триггеры удалены для всей базы: правка не из массовой вставки
+    # тоже должна попасть в индекс.
+    with deferred_index():
+        Note.objects.filter(pk=note.pk).update(title="Переименована")
+    assert search(author_client, "Переименована") == [note]
+    assert search(author_client, "Заголовок") == []
+
+
+def test_long_text_is_stored_compressed(author_client, author, settings):
+    settings.NOTES_TEXT_COMPRESS_THRESHOLD = 100
+    text = "Строка журнала с ошибкой\n" * 50
+    note = Note.objects.create(title="Журнал", text=text, author=author)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT typeof(text), length(text) FROM notes_note WHERE id = %s",
+            [note.id],
+        )
+        kind, length = cursor.fetchone()
+    assert kind == "blob" and length < len(text)
+    # Текст распаковывается только при обращении к атрибуту.
+    loaded = Note.objects.get(pk=note.pk)
+    assert isinstance(loaded.__dict__["text"], CompressedText)
+    loaded.save()
+    assert isinstance(loaded.__dict__["text"], CompressedText)
+    assert loaded.text == text
+    response = author_client.get(reverse("notes:detail", args=(note.slug,)))
+    assert response.context["object"].text == text
+    assert search(author_client, "ошибкой") == [note]
+
+
+def test_revisions_are_deltas_with_periodic_snapshots(
+    author_client, not_author_client, note, settings,
+    django_capture_on_commit_callbacks,
+):
+    settings.NOTES_REVISIONS_ASYNC = False
+    settings.NOTES_REVISION_SNAPSHOT_EVERY = 3
+    base = "".join(f"строка {number}\n" for number in range(50))
+    Note.objects.filter(pk=note.pk).update(text=base)
+    # Форма обрезает пробельные символы в конце текста.
+    texts = [base + f"правка {number}" for number in range(1, 6)]
+    for text in texts:
+        with django_capture_on_commit_callbacks(execute=True):
+            author_client.post(
+                reverse("notes:edit", args=(note.slug,)),
+                {"title": note.title, "text": text, "slug": note.slug},
+            )
+    revisions = list(note.revisions.order_by("number"))
+    # Первая версия - текст до правок, полный текст хранится каждые 3 версии.
+    assert [revision.is_snapshot for revision in revisions] == [
+        True, False, False, True, False, False
+    ]
+    assert [revision_text(revision) for revision in revisions] == [
+        base, *texts
+    ]
+    assert len(revisions[1].data) < len(base)
+    url = reverse("notes:revision", args=(note.slug, 2))
+    assert not_author_client.post(url).status_code == HTTPStatus.NOT_FOUND
+    with django_capture_on_commit_callbacks(execute=True):
+        response = author_client.post(url)
+    assertRedirects(response, reverse("notes:success"))
+    note.refresh_from_db()
+    assert note.text == texts[0]
+    assert note.revisions.count() == 7
+
+
+def test_same_title_gets_next_free_slug(
+    author_client, not_author_client, form_data
+):
+    # Два пользователя называют заметки одинаково, slug не указан.
+    form_data.pop("slug")
+    for client in (author_client, not_author_client, author_client):
+        response = client.post(reverse("notes:add"), data=form_data)
+        assertRedirects(response, reverse("notes:success"))
+    expected = slugify(form_data["title"])
+    assert set(Note.objects.values_list("slug", flat=True)) == {
+        expected, f"{expected}-2", f"{expected}-3"
+    }
+
+
+def test_slug_allocation_loads_only_suffixed_slugs(author, monkeypatch):
+    Note.objects.bulk_create(
+        Note(title="Заметка", text="Текст", author=author, slug=slug)
+        for slug in ("zametka", "zametka-2", "zametka-pro", "zametka-pro-2")
+    )
+    loaded = []
+
+    class Allocator(SlugAllocator):
+        def __init__(self, taken, *args):
+            taken = list(taken)
+            loaded.extend(taken)
+            super().__init__(taken, *args)
+
+    monkeypatch.setattr("notes.slugs.SlugAllocator", Allocator)
+    note = Note.objects.create(title="Заметка", text="Текст", author=author)
+    assert note.slug == "zametka-3"
+    assert sorted(loaded) == ["zametka", "zametka-2"]
+
+
+def test_slug_allocation_retries_on_integrity_error(author, note, monkeypatch):
+    # Первый выбранный slug успела занять параллельная запись.
+    candidates = iter((note.slug, "svobodnyij"))
+    monkeypatch.setattr(
+        "notes.models.allocate_slug", lambda *args, **kwargs: next(candidates)
+    )
+    new_note = Note.objects.create(title="Гонка", text="Текст", author=author)
+    assert new_note.slug == "svobodnyij"
+
+
+def api(client, method, name, data=None, args=None):
+    return getattr(client, method)(
+        reverse(name, args=args),
+        data=json.dumps(data),
+        content_type="application/json",
+    )
+
+
+def test_api_crud(author_client, not_author_client, note, form_data):
+    response = api(author_client, "post", "notes:api_list", form_data)
+    assert response.status_code == HTTPStatus.CREATED
+    slug = response.json()["slug"]
+    response = api(author_client, "patch", "notes:api_detail",
+                   {"title": "Изменено"}, args=(slug,))
+    assert response.json()["title"] == "Изменено"
+    assert response.json()["text"] == form_data["text"]
+    response = author_client.get(reverse("notes:api_list"))
+    assert [item["slug"] for item in response.json()["results"]] == [
+        note.slug, slug
+    ]
+    # Чужие заметки недоступны так же, как в HTML-интерфейсе.
+    response = not_author_client.get(reverse("notes:api_detail", args=(slug,)))
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    response = api(author_client, "delete", "notes:api_detail", args=(slug,))
+    assert response.status_code == HTTPStatus.NO_CONTENT
+    assert Note.objects.count() == 1
+    # Удалённая заметка лежит в корзине, её можно восстановить.
+    assert Note.all_objects.get(slug=slug).deleted_at is not None
+
+
+def test_api_requires_login_and_json(client, author_client, form_data):
+    response = client.get(reverse("notes:api_list"))
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+    response = author_client.post(reverse("notes:api_list"), data=form_data)
+    assert response.status_code == HTTPStatus.UNSUPPORTED_MEDIA_TYPE
+
+
+def test_api_batch(author_client, note):
+    response = api(author_client, "post", "notes:api_batch", {
+        "create": [
+            {"title": "Раз", "text": "1"}, {"title": "Два", "text": "2"}
+        ],
+        "update": [{"slug": note.slug, "changes": {"text": "Новый"}}],
+    })
+    assert response.status_code == HTTPStatus.OK
+    assert len(response.json()["created"]) == 2
+    note.refresh_from_db()
+    assert note.text == "Новый"
+    response = api(author_client, "post", "notes:api_batch", {
+        "delete": [note.slug],
+    })
+    assert response.json()["deleted"] == [note.slug]
+    assert Note.objects.count() == 2
+    assert Note.all_objects.filter(deleted_at__isnull=False).get() == note
+
+
+def test_api_batch_is_atomic(author_client, note):
+    response = api(author_client, "post", "notes:api_batch", {
+        # Занятый slug отклоняется по тем же правилам, что и в форме.
+        "create": [{"title": "Раз", "text": "1", "slug": note.slug}],
+        "update": [{"slug": note.slug, "changes": {"text": "Новый"}}],
+        "delete": ["no-such-note"],
+    })
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    errors = response.json()["errors"]
+    assert errors["create.0"] == {"slug": [note.slug + WARNING]}
+    assert set(errors) == {"create.0", "delete.0"}
+    # Успешное изменение из того же пакета откатилось.
+    note.refresh_from_db()
+    assert note.text == "Текст заметки"
+    assert Note.objects.count() == 1
+
+
+def test_parallel_edit_returns_conflict(author_client, note, form_data):
+    url = reverse("notes:edit", args=(note.slug,))
+    # Вторая вкладка успела сохранить заметку после открытия формы.
+    Note.objects.filter(pk=note.pk).update(text="Правка из другой вкладки")
+    response = author_client.post(url, {**form_data, "version": note.version})
+    assert response.status_code == HTTPStatus.CONFLICT
+    assert "-Правка из другой вкладки" in response.context["diff"]
+    form = response.context["form"]
+    assert form.initial["text"] == form_data["text"]
+    assert form.initial["version"] == note.version + 1
+    # Ничего не перезаписано; повтор с новой версией проходит.
+    note.refresh_from_db()
+    assert note.text == "Правка из другой вкладки"
+    response = author_client.post(url, {**form_data, "version": note.version})
+    assertRedirects(response, reverse("notes:success"))
+    note.refresh_from_db()
+    assert (note.text, note.version) == (form_data["text"], 3)
+
+
+def test_unchanged_edit_is_not_written(author_client, note):
+    data = {"title": note.title, "text": note.text, "slug": note.slug,
+            "version": note.version}
+    url = reverse("notes:edit", args=(note.slug,))
+    with CaptureQueriesContext(connection) as context:
+        response = author_client.post(url, data)
+    # Запросы читаются до assertRedirects: новый запрос очищает их журнал.
+    assert context.captured_queries and not any(
+        query["sql"].startswith("UPDATE") for query in context.captured_queries
+    )
+    assertRedirects(response, reverse("notes:success"))
+    data["title"] = "Новый заголовок"
+    with CaptureQueriesContext(connection) as context:
+        author_client.post(url, data)
+    updates = [query["sql"] for query in context.captured_queries
+               if query["sql"].startswith("UPDATE")]
+    # Меняется только заголовок, текст заново не пишется.
+    assert len(updates) == 1 and '"text"' not in updates[0]
+
+
+def test_bulk_trash_restore_and_purge(author_client, not_author, many_notes):
+    # bulk_create в SQLite не заполняет id, берём их из базы.
+    ids = list(Note.objects.order_by("id").values_list("id", flat=True)[:10])
+    other = Note.objects.create(title="Чужая", text="Текст", author=not_author)
+    url = reverse("notes:trash")
+    with CaptureQueriesContext(connection) as context:
+        response = author_client.post(
+            url, {"action": "trash", "notes": ids + [other.id]}
+        )
+    writes = [query["sql"] for query in context.captured_queries
+              if query["sql"].startswith('UPDATE "notes_note" ')]
+    assert len(writes) == 1
+    assertRedirects(response, reverse("notes:list"))
+    # Чужая заметка не затронута, удалённые пропали из поискового индекса.
+    assert Note.objects.count() == 6
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM notes_note_fts")
+        assert cursor.fetchone()[0] == 6
+    author_client.post(url, {"action": "restore", "notes": ids[:2]})
+    assert Note.objects.count() == 8
+    author_client.post(url, {"action": "purge", "notes": ids})
+    assert Note.all_objects.count() == 8
+    response = author_client.post(url, {"action": "drop", "notes": ids})
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_purge_trash_command(author, many_notes):
+    ids = list(Note.objects.order_by("id").values_list("id", flat=True))
+    Note.objects.filter(pk__in=ids[:7]).update(
+        deleted_at=timezone.now() - timedelta(days=31)
+    )
+    Note.objects.filter(pk__in=ids[7:9]).trash()
+    out = io.StringIO()
+    call_command(
+        "purge_trash", "--batch-size", "3", "--pause", "0", stdout=out
+    )
+    assert "7" in out.getvalue()
+    assert Note.all_objects.count() == 8
+    assert Note.objects.count() == 6
+
+
+def test_purge_keeps_note_restored_during_batch(
+    author, many_notes, monkeypatch
+):
+    Note.objects.update(deleted_at=timezone.now() - timedelta(days=31))
+    restored = Note.all_objects.order_by("id").first()
+    purge = NoteQuerySet.purge
+
+    def restore_then_purge(queryset):
+        # Заметку восстанавливают между выборкой пачки и удалением.
+        Note.all_objects.filter(pk=restored.pk).restore()
+        return purge(queryset)
+
+    monkeypatch.setattr(NoteQuerySet, "purge", restore_then_purge)
+    assert purge_trash(timedelta(days=30)) == len(many_notes) - 1
+    assert list(Note.objects.all()) == [restored]
+
+
+def test_tags_counts_and_filter(author_client, author, note, form_data):
+    author_client.post(
+        reverse("notes:add"), {**form_data, "tags": "Дом, работа"}
+    )
+    note.set_tags(["работа"])
+    tags = {tag.name: tag.notes_count for tag in author.tags.all()}
+    assert tags == {"Дом": 1, "работа": 2}
+    url = reverse("notes:list")
+    response = author_client.get(url, {"tag": "Дом"})
+    assert [item.slug for item in response.context["object_list"]] == [
+        form_data["slug"]
+    ]
+    assert author_client.get(url, {"tag": "нет"}).status_code == (
+        HTTPStatus.NOT_FOUND
+    )
+    # Корзина и восстановление меняют счётчики, правка формы - тоже.
+    Note.objects.filter(pk=note.pk).trash()
+    assert author.tags.get(name="работа").notes_count == 1
+    Note.all_objects.filter(pk=note.pk).restore()
+    author_client.post(reverse("notes:edit", args=(form_data["slug"],)),
+                       {**form_data, "tags": "работа"})
+    tags = {tag.name: tag.notes_count for tag in author.tags.all()}
+    assert tags == {"Дом": 0, "работа": 2}
+
+
+def test_tag_list_cache_key_is_memcached_safe(author_client, note):
+    note.set_tags(["Дом и работа"])
+    # Ключ с пробелом locmem отмечает тем же предупреждением, на котором
+    # memcached отклонил бы запись.
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", CacheKeyWarning)
+        response = author_client.get(
+            reverse("notes:list"), {"tag": "Дом и работа"}
+        )
+    assert list(response.context["object_list"]) == [note]
+
+
+def test_list_loads_tags_with_one_query(author_client, author, many_notes):
+    for note in Note.objects.all()[:5]:
+        note.set_tags([f"метка {note.pk}", "общая"])
+    with CaptureQueriesContext(connection) as context:
+        response = author_client.get(reverse("notes:list"))
+    tag_queries = [query for query in context.captured_queries
+                   if "notes_tag" in query["sql"]]
+    # Одна загрузка меток для страницы и одна для боковой панели.
+    assert len(tag_queries) == 2
+    assert response.content.decode().count("общая") == 6
+
+
+def note_stats(author):
+    return NoteStats.objects.values_list(
+        "notes_count", "notes_size"
+    ).get(user=author)
+
+
+def test_note_stats_follow_writes(author_client, author, note, form_data):
+    assert note_stats(author) == (1, len("Текст заметки".encode()))
+    author_client.post(reverse("notes:add"), form_data)
+    author_client.post(reverse("notes:edit", args=(form_data["slug"],)),
+                       {**form_data, "text": "Короче"})
+    Note.objects.filter(pk=note.pk).trash()
+    expected = (1, len("Короче".encode()))
+    assert note_stats(author) == expected
+    Note.all_objects.filter(pk=note.pk).purge()
+    Note.objects.bulk_create([Note(title="Раз", text="1", slug="one",
+                                   author=author)])
+    Note.objects.get(slug="one").delete()
+    assert note_stats(author) == expected
+    # Пересчёт с нуля даёт те же значения.
+    call_command("rebuild_note_stats", "--batch-size", "1",
+                 stdout=io.StringIO())
+    assert note_stats(author) == expected
+    response = author_client.get(reverse("notes:list"))
+    assert "заметок 1," in response.content.decode()
+
+
+def test_quota_blocks_new_notes_and_growth(author_client, note, settings,
+                                           form_data):
+    settings.NOTES_QUOTA_NOTES = 1
+    settings.NOTES_QUOTA_BYTES = 100
+    response = author_client.post(reverse("notes:add"), form_data)
+    assert response.status_code == HTTPStatus.OK
+    assert "Достигнут предел" in response.content.decode()
+    url = reverse("notes:edit", args=(note.slug,))
+    data = {"title": note.title, "slug": note.slug, "text": "я" * 60}
+    response = author_client.post(url, data)
+    assert response.status_code == HTTPStatus.OK
+    assert Note.objects.get().text == note.text
+    response = author_client.post(url, {**data, "text": "Коротко"})
+    assertRedirects(response, reverse("notes:success"))
+
+
+def test_revisions_are_recorded_by_workers(author_client, note):
+    url = reverse("notes:edit", args=(note.slug,))
+    texts = ["Первая правка", "Вторая правка"]
+    for text in texts:
+        author_client.post(
+            url, {"title": note.title, "text": text, "slug": note.slug}
+        )
+    # Запрос только ставит задачу, версию записывает воркер; правки
+    # до её запуска сливаются в одну версию.
+    job = Job.objects.get(group=f"revisions:{note.pk}")
+    assert "правка" not in job.args
+    assert not note.revisions.exists()
+    call_command(
+        "run_workers", "--once", "--threads", "1", stdout=io.StringIO()
+    )
+    revisions = note.revisions.order_by("number")
+    assert [revision_text(revision) for revision in revisions] == [
+        "Текст заметки", texts[-1]
+    ]
+    assert not Job.objects.exists()
+    # С историей текст до правки в задачу не попадает.
+    author_client.post(
+        url, {"title": note.title, "text": "Третья правка", "slug": note.slug}
+    )
+    assert Job.objects.get().args == f"[{note.pk}, null]"
+
+
+def test_revisions_of_compressed_text(author_client, note, settings):
+    settings.NOTES_TEXT_COMPRESS_THRESHOLD = 100
+    url = reverse("notes:edit", args=(note.slug,))
+    texts = ["\n".join(["Длинная строка"] * size) for size in (50, 60)]
+    for text in texts:
+        author_client.post(
+            url, {"title": note.title, "text": text, "slug": note.slug}
+        )
+        assert run_workers(once=True) == 1
+    assert not Job.objects.exists()
+    revisions = note.revisions.order_by("number")
+    assert [revision_text(revision) for revision in revisions] == [
+        "Текст заметки", *texts
+    ]
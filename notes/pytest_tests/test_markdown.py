@@ -0,0 +1,49 @@
+from django.urls import reverse
+
+from notes.markup import render_markdown
+from notes.models import Note
+
+
+def test_note_text_rendered_as_markdown(author_client, note, monkeypatch):
+    Note.objects.filter(pk=note.pk).update(
+        text="# Заголовок\n\n**важно** <script>alert(1)</script>\n"
+             "[ссылка](javascript:alert(1))"
+    )
+    url = reverse("notes:detail", args=(note.slug,))
+    content = author_client.get(url).content.decode()
+    assert "<h1>Заголовок</h1>" in content
+    assert "<strong>важно</strong>" in content
+    # Сырой HTML и опасные ссылки выводятся как текст.
+    assert "&lt;script&gt;" in content
+    assert 'href="javascript' not in content
+    # Неизменённый текст берётся из кеша по хешу, без повторного разбора.
+    calls = []
+    monkeypatch.setattr(
+        "notes.markup.render_markdown", lambda text: calls.append(text)
+    )
+    assert "<h1>Заголовок</h1>" in author_client.get(url).content.decode()
+    assert calls == []
+
+
+def test_large_text_is_not_parsed(settings):
+    settings.NOTES_MARKDOWN_MAX_LENGTH = 10
+    assert render_markdown("**<b>жирный</b>**") == (
+        "<pre>**&lt;b&gt;жирный&lt;/b&gt;**</pre>"
+    )
+
+
+def test_emphasis_stays_outside_link_urls():
+    assert render_markdown("[a](https://x.com/a*b*c)") == (
+        '<p><a href="https://x.com/a*b*c" rel="nofollow noopener">a</a></p>'
+    )
+    assert render_markdown("**[a](https://x.com/**b)**") == (
+        '<p>**<a href="https://x.com/**b" rel="nofollow noopener">a</a>**</p>'
+    )
+    assert render_markdown("[*a*](/x) *b*") == (
+        '<p><a href="/x" rel="nofollow noopener"><em>a</em></a> <em>b</em></p>'
+    )
+
+
+def test_backslash_after_slash_is_not_a_local_link():
+    assert "href" not in render_markdown("[a](/\\evil.com)")
+    assert "href" not in render_markdown("[a](//evil.com)")
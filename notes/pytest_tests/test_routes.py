@@ -2,8 +2,15 @@ from http import HTTPStatus
 import pytest
 from pytest_django.asserts import assertRedirects
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from notes import urls as notes_urls
+from notes.auth import USER_KEY, user_cache
+from notes.checks import check_shared_caches
+from notes.metrics import registry
+
 
 @pytest.mark.parametrize(
     "name",  # Имя параметра функции.
@@ -17,7 +24,11 @@ def test_pages_availability_for_anonymous_user(client, name):
     assert response.status_code == HTTPStatus.OK
 
 
-@pytest.mark.parametrize("name", ("notes:list", "notes:add", "notes:success"))
+@pytest.mark.parametrize(
+    "name",
+    ("notes:list", "notes:add", "notes:success", "notes:search",
+     "notes:export", "notes:trash"),
+)
 def test_pages_availability_for_auth_user(not_author_client, name):
     url = reverse(name)
     response = not_author_client.get(url)
@@ -26,7 +37,7 @@ def test_pages_availability_for_auth_user(not_author_client, name):
 
 @pytest.mark.parametrize(
     "name",
-    ("notes:detail", "notes:edit", "notes:delete"),
+    ("notes:detail", "notes:edit", "notes:delete", "notes:revisions"),
 )
 def test_pages_availability_for_author(author_client, name, note):
     url = reverse(name, args=(note.slug,))
@@ -48,7 +59,7 @@ def test_pages_availability_for_author(author_client, name, note):
 # Этот декоратор оставляем таким же, как в предыдущем тесте.
 @pytest.mark.parametrize(
     "name",
-    ("notes:detail", "notes:edit", "notes:delete"),
+    ("notes:detail", "notes:edit", "notes:delete", "notes:revisions"),
 )
 # В параметры теста добавляем имена parametrized_client и expected_status.
 def test_pages_availability_for_different_users(
@@ -67,9 +78,16 @@ def test_pages_availability_for_different_users(
         ("notes:detail", pytest.lazy_fixture("slug_for_args")),  # type: ignore
         ("notes:edit", pytest.lazy_fixture("slug_for_args")),  # type: ignore
         ("notes:delete", pytest.lazy_fixture("slug_for_args")),  # type: ignore
+        (
+            "notes:revisions",
+            pytest.lazy_fixture("slug_for_args"),  # type: ignore
+        ),
         ("notes:add", None),
         ("notes:success", None),
         ("notes:list", None),
+        ("notes:search", None),
+        ("notes:export", None),
+        ("notes:trash", None),
     ),
 )
 # Передаём в тест анонимный клиент, name проверяемых страниц и args:
@@ -80,3 +98,63 @@ def test_redirects(client, name, args):
     expected_url = f"{login_url}?next={url}"
     response = client.get(url)
     assertRedirects(response, expected_url)
+
+
+@pytest.mark.parametrize("pattern", notes_urls.urlpatterns,
+                         ids=lambda pattern: pattern.name)
+def test_no_session_or_user_queries(author_client, note, pattern):
+    values = {"slug": note.slug, "number": 1}
+    kwargs = {name: values[name] for name in pattern.pattern.converters}
+    url = reverse(f"notes:{pattern.name}", kwargs=kwargs)
+    # Первый запрос заполняет кеш сессии и пользователя.
+    author_client.get(url)
+    with CaptureQueriesContext(connection) as context:
+        response = author_client.get(url)
+    assert response.status_code != HTTPStatus.FOUND
+    tables = " ".join(query["sql"] for query in context.captured_queries)
+    assert "django_session" not in tables
+    assert "auth_user" not in tables
+
+
+def test_user_cache_dropped_on_logout(author_client, author):
+    author_client.get(reverse("notes:list"))
+    author_client.get(reverse("users:logout"))
+    assert user_cache().get(USER_KEY.format(user_id=author.pk)) is None
+    response = author_client.get(reverse("notes:list"))
+    assert response.status_code == HTTPStatus.FOUND
+
+
+def test_password_change_ends_cached_session(author_client, author):
+    author_client.get(reverse("notes:list"))
+    author.set_password("новый-пароль")
+    author.save()
+    response = author_client.get(reverse("notes:list"))
+    assert response.status_code == HTTPStatus.FOUND
+
+
+def test_sessions_require_shared_cache(settings):
+    assert check_shared_caches(None) == []
+    settings.SESSION_CACHE_ALIAS = "default"
+    assert [error.id for error in check_shared_caches(None)] == ["notes.E001"]
+
+
+def test_metrics_endpoint(author_client, note, client):
+    registry.reset()
+    author_client.get(reverse("notes:list"))
+    author_client.get(reverse("notes:detail", args=(note.slug,)))
+    body = client.get(reverse("metrics")).content.decode()
+    assert 'yanote_requests_total{view="notes:list",status="200"} 1' in body
+    assert 'yanote_request_duration_seconds_count{view="notes:detail"} 1' in (
+        body
+    )
+    assert 'yanote_template_render_seconds_count{view="notes:list"} 1' in body
+    assert 'yanote_db_queries_total{view="notes:list"}' in body
+
+
+def test_request_over_budget_is_logged(author_client, settings, caplog):
+    settings.REQUEST_QUERY_BUDGET = 0
+    author_client.get(reverse("notes:list"))
+    record = next(
+        record for record in caplog.records if record.name == "notes.metrics"
+    )
+    assert record.view == "notes:list" and record.queries > 0
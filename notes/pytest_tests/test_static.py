@@ -0,0 +1,119 @@
+import base64
+import gzip
+import hashlib
+import io
+import re
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+
+from notes import static
+from notes.metrics import registry
+
+
+# Устроен как bootstrap.min.css: лицензия, переменные, правила, @media.
+BOOTSTRAP_CSS = (
+    "/*! Bootstrap v5.0.1 | MIT */:root{--bs-blue:#0d6efd}"
+    "*,::after,::before{box-sizing:border-box}"
+    ".navbar{display:flex}.btn,.nav-link{padding:.5rem 1rem}"
+    "[type=button]{cursor:pointer}"
+    "@media (min-width:576px){.container{max-width:540px}.modal{margin:0}}"
+    "@keyframes spin{to{transform:rotate(360deg)}}"
+    + ".btn-primary{color:#fff;background-color:#0d6efd}" * 20
+    + "/*# sourceMappingURL=bootstrap.min.css.map */"
+)
+
+
+@pytest.fixture
+def vendored(settings, tmp_path, monkeypatch):
+    data = BOOTSTRAP_CSS.encode()
+    digest = base64.b64encode(hashlib.sha384(data).digest()).decode()
+    settings.NOTES_BOOTSTRAP_INTEGRITY = f"sha384-{digest}"
+    settings.STATICFILES_DIRS = [tmp_path / "static"]
+    monkeypatch.setattr(
+        "notes.management.commands.vendor_bootstrap.urlopen",
+        lambda url, timeout: io.BytesIO(data),
+    )
+    call_command("vendor_bootstrap", stdout=io.StringIO())
+    static.exists.cache_clear()
+    static.inline.cache_clear()
+    yield tmp_path / "static"
+    static.exists.cache_clear()
+    static.inline.cache_clear()
+
+
+def test_bootstrap_from_cdn_until_vendored(client, settings):
+    content = client.get(reverse("users:login")).content.decode()
+    assert f'href="{settings.NOTES_BOOTSTRAP_URL}"' in content
+    assert settings.NOTES_BOOTSTRAP_INTEGRITY in content
+    assert "<style>" not in content
+
+
+def test_vendor_bootstrap_checks_integrity(settings, monkeypatch):
+    settings.NOTES_BOOTSTRAP_INTEGRITY = "sha384-другой"
+    monkeypatch.setattr(
+        "notes.management.commands.vendor_bootstrap.urlopen",
+        lambda url, timeout: io.BytesIO(b"body{}"),
+    )
+    with pytest.raises(CommandError):
+        call_command("vendor_bootstrap", stdout=io.StringIO())
+
+
+def test_critical_css_is_derived_from_bootstrap(vendored):
+    assert (vendored / "css" / "critical.css").read_text() == (
+        "/*! Bootstrap v5.0.1 | MIT */\n:root{--bs-blue:#0d6efd}"
+        "*,::after,::before{box-sizing:border-box}"
+        ".navbar{display:flex}.nav-link{padding:.5rem 1rem}"
+        "@media (min-width:576px){.container{max-width:540px}}\n"
+    )
+
+
+def test_static_files_are_hashed_and_compressed(
+    client, settings, tmp_path, vendored
+):
+    settings.STATIC_ROOT = tmp_path / "root"
+    call_command("collectstatic", interactive=False, verbosity=0)
+    content = client.get(reverse("users:login")).content.decode()
+    # Критический CSS встроен в страницу, Bootstrap - файл с хешем в имени.
+    assert "<style>" in content and ".navbar{" in content
+    url = re.search(
+        r'href="(/static/vendor/bootstrap/bootstrap\.min\.\w+\.css)"',
+        content,
+    ).group(1)
+    response = client.get(url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+    assert response["Content-Encoding"] == "gzip"
+    assert response["Cache-Control"].endswith("immutable")
+    body = gzip.decompress(b"".join(response.streaming_content))
+    assert body == BOOTSTRAP_CSS.encode()
+
+
+def test_static_files_are_counted_in_metrics(client):
+    registry.reset()
+    client.get("/static/admin/css/base.css")
+    body = client.get(reverse("metrics")).content.decode()
+    assert 'yanote_requests_total{view="static",status="200"} 1' in body
+
+
+def test_responses_are_minified_and_gzipped(client, author_client, many_notes):
+    url = reverse("notes:list")
+    content = author_client.get(url).content.decode()
+    # Отступы шаблонов убраны при компиляции.
+    assert "\n " not in content
+    response = author_client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+    assert response["Content-Encoding"] == "gzip"
+    assert "Заметка 0" in gzip.decompress(response.content).decode()
+    # Потоковая выгрузка сжимается по частям, а zip не сжимается повторно.
+    export = reverse("notes:export")
+    response = author_client.get(export, HTTP_ACCEPT_ENCODING="gzip")
+    assert response.streaming
+    assert response["Content-Encoding"] == "gzip"
+    body = gzip.decompress(b"".join(response.streaming_content)).decode()
+    assert len(body.splitlines()) == len(many_notes)
+    response = author_client.get(
+        export, {"format": "zip"}, HTTP_ACCEPT_ENCODING="gzip"
+    )
+    assert not response.has_header("Content-Encoding")
+    # Короткие ответы, например редирект на вход, отдаются как есть.
+    response = client.get(reverse("notes:add"), HTTP_ACCEPT_ENCODING="gzip")
+    assert not response.has_header("Content-Encoding")
@@ -0,0 +1,59 @@
+from http import HTTPStatus
+from pytest_django.asserts import assertRedirects
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from notes import throttle
+
+
+def test_writes_are_throttled(author_client, client, settings, form_data):
+    settings.NOTES_THROTTLE_USER = (2, 60)
+    url = reverse("notes:add")
+    for index in range(2):
+        response = author_client.post(url, {**form_data, "slug": f"s-{index}"})
+        assertRedirects(response, reverse("notes:success"))
+    # Корзина пользователя пуста: ответ 429 без обращений к БД.
+    with CaptureQueriesContext(connection) as context:
+        response = author_client.post(url, form_data)
+    assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+    assert int(response["Retry-After"]) == 30
+    assert len(context.captured_queries) == 0
+    # Чтение не ограничивается, а аноним тратит только корзину IP-адреса.
+    assert author_client.get(url).status_code == HTTPStatus.OK
+    settings.NOTES_THROTTLE_IP = (1, 60)
+    response = client.post(reverse("users:signup"), {})
+    assert response.status_code == HTTPStatus.OK
+    response = client.post(reverse("users:signup"), {})
+    assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+
+
+def test_concurrent_writers_are_capped(author_client, settings, form_data):
+    settings.NOTES_THROTTLE_MAX_WRITERS = 1
+    state = throttle.get_state()
+    slot = state.acquire_writer(1, settings.NOTES_THROTTLE_WRITER_TIMEOUT)
+    response = author_client.post(reverse("notes:add"), form_data)
+    assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+    assert response["Retry-After"] == "1"
+    state.release_writer(slot)
+    response = author_client.post(reverse("notes:add"), form_data)
+    assertRedirects(response, reverse("notes:success"))
+
+
+def test_rejected_write_spends_no_tokens(tmp_path):
+    state = throttle.SharedState(str(tmp_path / "state"), 64, 1)
+    assert state.take([("ip:1", 1, 60)]) == 0
+    # Корзина IP пуста: токен пользователя не тратится.
+    assert state.take([("user:1", 1, 60), ("ip:1", 1, 60)]) > 0
+    assert state.take([("user:1", 1, 60)]) == 0
+    state.close()
+
+
+def test_writer_slot_from_before_reboot_is_freed(tmp_path, monkeypatch):
+    state = throttle.SharedState(str(tmp_path / "state"), 64, 1)
+    assert state.acquire_writer(1, 30) is not None
+    # Часы ушли назад: время занятого слота оказалось в будущем.
+    now = throttle.time.time()
+    monkeypatch.setattr(throttle.time, "time", lambda: now - 3600)
+    assert state.acquire_writer(1, 30) is not None
+    state.close()
@@ -0,0 +1,147 @@
+import base64
+import difflib
+import json
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .fields import compress, decompress
+from .jobs import enqueue
+from .models import Note, NoteRevision
+
+
+def make_delta(old, new):
+    """Построчная разница old -> new в JSON.
+
+    ['=', i, j] копирует строки old[i:j], ['+', text] вставляет текст;
+    удалённые строки просто не копируются.
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines)
+    delta = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            delta.append(['=', i1, i2])
+        elif j2 > j1:
+            delta.append(['+', ''.join(new_lines[j1:j2])])
+    return json.dumps(delta, ensure_ascii=False)
+
+
+def apply_delta(old, delta):
+    old_lines = old.splitlines(keepends=True)
+    parts = []
+    for operation in json.loads(delta):
+        if operation[0] == '=':
+            parts.extend(old_lines[operation[1]:operation[2]])
+        else:
+            parts.append(operation[1])
+    return ''.join(parts)
+
+
+def _chain(note_id, number):
+    """Версии от ближайшего снимка до number включительно."""
+    revisions = NoteRevision.objects.filter(note_id=note_id)
+    snapshot = revisions.filter(
+        number__lte=number, is_snapshot=True
+    ).order_by('-number').values_list('number', flat=True).first()
+    return list(revisions.filter(
+        number__gte=snapshot or 0, number__lte=number
+    ).order_by('number'))
+
+
+def _rebuild(chain):
+    text = chain[0].data
+    for revision in chain[1:]:
+        text = apply_delta(text, revision.data)
+    return text
+
+
+def revision_text(revision):
+    """Текст версии из ближайшего снимка и разниц после него."""
+    if revision.is_snapshot:
+        return revision.data
+    return _rebuild(_chain(revision.note_id, revision.number))
+
+
+def _append(note_id, title, text, previous):
+    last = NoteRevision.objects.filter(
+        note_id=note_id
+    ).order_by('-number').first()
+    if last is None:
+        # Истории ещё нет: первой версией становится текст до правки.
+        first_title, first_text = previous or (title, text)
+        last = NoteRevision.objects.create(
+            note_id=note_id, number=1, title=first_title,
+            is_snapshot=True, data=first_text,
+        )
+        if previous is None:
+            return
+    chain = _chain(note_id, last.number)
+    last_text = _rebuild(chain)
+    if (last.title, last_text) == (title, text):
+        return
+    delta = make_delta(last_text, text)
+    # Снимок ограничивает длину цепочки; разница больше текста не нужна.
+    is_snapshot = (
+        len(chain) >= settings.NOTES_REVISION_SNAPSHOT_EVERY
+        or len(delta) >= len(text)
+    )
+    NoteRevision.objects.create(
+        note_id=note_id, number=last.number + 1, title=title,
+        is_snapshot=is_snapshot, data=text if is_snapshot else delta,
+    )
+
+
+def record_revision(note_id, title, text, previous=None):
+    """Добавляет версию (title, text) в историю заметки.
+
+    previous - заголовок и текст до правки, нужны для первой версии.
+    Номер могла занять параллельная запись, тогда пробуем ещё раз.
+    """
+    if not Note.objects.filter(pk=note_id).exists():
+        return
+    try:
+        with transaction.atomic():
+            _append(note_id, title, text, previous)
+    except IntegrityError:
+        with transaction.atomic():
+            _append(note_id, title, text, previous)
+
+
+def record_note_revision(note_id, previous=None):
+    """Задача очереди: версия из текущих заголовка и текста заметки.
+
+    previous - заголовок и сжатый текст до правки, если истории нет.
+    """
+    # Через модель: дескриптор распаковывает сжатый текст в строку.
+    note = Note.objects.filter(pk=note_id).only('title', 'text').first()
+    if note is None:
+        return
+    if previous is not None:
+        title, packed = previous
+        previous = (title, decompress(base64.b64decode(packed)))
+    record_revision(note_id, note.title, note.text, previous)
+
+
+def schedule_revision(note, previous=None):
+    """Записывает версию фоновой задачей, не задерживая ответ.
+
+    В задачу попадает только id заметки: текст она читает сама, и правки,
+    сделанные до её запуска, дают одну версию. Текст до правки нужен
+    лишь заметке без истории и хранится сжатым.
+    """
+    if not settings.NOTES_REVISIONS_ASYNC:
+        args = (note.pk, note.title, note.text, previous)
+        transaction.on_commit(lambda: record_revision(*args))
+        return
+    if previous is not None and NoteRevision.objects.filter(
+        note_id=note.pk
+    ).exists():
+        previous = None
+    if previous is not None:
+        title, text = previous
+        packed = base64.b64encode(compress(text.encode())).decode()
+        previous = (title, packed)
+    key = f'revisions:{note.pk}'
+    enqueue(record_note_revision, note.pk, previous, key=key, group=key)
@@ -0,0 +1,26 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+use_primary = ContextVar('use_primary', default=False)
+
+
+class PrimaryReplicaRouter:
+    """Чтение с реплик, запись и чтение сразу после записи - с основной БД."""
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or use_primary.get():
+            return 'default'
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На всех алиасах одни и те же данные.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == 'default'
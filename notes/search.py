@@ -0,0 +1,159 @@
+import re
+from contextlib import contextmanager
+
+from django.db import connections, router
+from django.db.models import Q
+
+from .models import Note
+
+# Заголовок весит больше текста, author_id служит только фильтром.
+RANK = 'bm25(notes_note_fts, 10.0, 1.0, 0.0)'
+MAX_TERMS = 16
+
+# Триггеры держат индекс в актуальном состоянии при любой записи в
+# notes_note, включая bulk_create и массовые update/delete. Текст может
+# быть сжат, поэтому в индекс он попадает через функцию note_text().
+# Заметки из корзины в индексе не хранятся.
+TRIGGERS = {
+    'notes_note_fts_ai': """
+        CREATE TRIGGER IF NOT EXISTS notes_note_fts_ai
+        AFTER INSERT ON notes_note WHEN new.deleted_at IS NULL BEGIN
+            INSERT INTO notes_note_fts(rowid, title, text, author_id)
+            VALUES (new.id, new.title, note_text(new.text), new.author_id);
+        END
+    """,
+    'notes_note_fts_ad': """
+        CREATE TRIGGER IF NOT EXISTS notes_note_fts_ad
+        AFTER DELETE ON notes_note WHEN old.deleted_at IS NULL BEGIN
+            INSERT INTO notes_note_fts(notes_note_fts, rowid, title, text,
+                                       author_id)
+            VALUES ('delete', old.id, old.title, note_text(old.text),
+                    old.author_id);
+        END
+    """,
+    'notes_note_fts_au': """
+        CREATE TRIGGER IF NOT EXISTS notes_note_fts_au
+        AFTER UPDATE OF title, text, author_id, deleted_at ON notes_note
+        BEGIN
+            INSERT INTO notes_note_fts(notes_note_fts, rowid, title, text,
+                                       author_id)
+            SELECT 'delete', old.id, old.title, note_text(old.text),
+                   old.author_id
+            WHERE old.deleted_at IS NULL;
+            INSERT INTO notes_note_fts(rowid, title, text, author_id)
+            SELECT new.id, new.title, note_text(new.text), new.author_id
+            WHERE new.deleted_at IS NULL;
+        END
+    """,
+}
+
+SEARCH_SQL = (
+    'SELECT rowid FROM notes_note_fts WHERE notes_note_fts MATCH %s '
+    f'ORDER BY {RANK} LIMIT %s OFFSET %s'
+)
+
+
+def build_match(author_id, query):
+    """Строит выражение FTS5 из слов запроса.
+
+    Слова берутся в кавычки, поэтому синтаксис FTS5 из запроса
+    пользователя не интерпретируется. Фильтр по author_id выполняется
+    внутри индекса, а не сканированием результатов.
+    """
+    terms = re.findall(r'\w+', query)[:MAX_TERMS]
+    if not terms:
+        return None
+    phrase = ' '.join(f'"{term}"' for term in terms)
+    return f'author_id:"{author_id}" AND {{title text}}:({phrase})'
+
+
+def search_notes(author, query, page=1, per_page=20):
+    """Возвращает заметки автора по релевантности и признак продолжения."""
+    connection = connections[router.db_for_read(Note)]
+    if connection.vendor != 'sqlite':
+        return _search_notes_fallback(author, query, page, per_page)
+    match = build_match(author.pk, query)
+    if match is None:
+        return [], False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            SEARCH_SQL, (match, per_page + 1, (page - 1) * per_page)
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+    has_next = len(ids) > per_page
+    ids = ids[:per_page]
+    notes = Note.objects.filter(author=author).only(
+        'id', 'slug', 'title'
+    ).in_bulk(ids)
+    return [notes[pk] for pk in ids if pk in notes], has_next
+
+
+def _search_notes_fallback(author, query, page, per_page):
+    terms = re.findall(r'\w+', query)[:MAX_TERMS]
+    if not terms:
+        return [], False
+    queryset = Note.objects.filter(author=author).only('id', 'slug', 'title')
+    for term in terms:
+        queryset = queryset.filter(
+            Q(title__icontains=term) | Q(text__icontains=term)
+        )
+    start = (page - 1) * per_page
+    notes = list(queryset.order_by('-id')[start:start + per_page + 1])
+    return notes[:per_page], len(notes) > per_page
+
+
+def rebuild_index(using='default'):
+    """Полностью перестраивает поисковый индекс по таблице заметок."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO notes_note_fts(notes_note_fts) VALUES ('rebuild')"
+        )
+
+
+def install_triggers(using='default', **kwargs):
+    """Восстанавливает триггеры индекса после миграций.
+
+    SQLite пересоздаёт таблицу при изменении схемы, и триггеры старой
+    таблицы пропадают. Если их не было, индекс перестраивается: записи
+    в промежутке могли пройти мимо него.
+    """
+    db = connections[using]
+    if db.vendor != 'sqlite':
+        return
+    with db.cursor() as cursor:
+        tables = db.introspection.table_names(cursor)
+        if 'notes_note_fts' not in tables:
+            return
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+            "AND tbl_name = 'notes_note'"
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        for sql in TRIGGERS.values():
+            cursor.execute(sql)
+    if not existing.issuperset(TRIGGERS):
+        rebuild_index(using)
+
+
+@contextmanager
+def deferred_index(using='default'):
+    """Отключает триггеры индекса на время массовой вставки.
+
+    После вставки индекс перестраивается целиком: это быстрее обновления
+    триггером на каждую строку. Триггеры удаляются для всей базы, поэтому
+    перестройка подхватывает и записи других соединений за это время.
+    """
+    db = connections[using]
+    if db.vendor != 'sqlite':
+        yield
+        return
+    with db.cursor() as cursor:
+        for name in TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+    try:
+        yield
+    finally:
+        with db.cursor() as cursor:
+            for sql in TRIGGERS.values():
+                cursor.execute(sql)
+        rebuild_index(using)
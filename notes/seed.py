@@ -0,0 +1,174 @@
+import math
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .cache import bump_versions
+from .models import Note, NoteStats, text_size
+from .search import deferred_index
+from .slugs import SlugAllocator, make_slug
+
+User = get_user_model()
+
+BATCH_SIZE = 5000
+TITLE_WORDS = (2, 6)
+# Хвост распределения ограничен, чтобы одна заметка не заняла всю память.
+MAX_WORDS_FACTOR = 100
+PARETO_ALPHA = 1.5
+LOGNORMAL_SIGMA = 1.0
+# Тексты - отрезки заранее перемешанной последовательности слов: так
+# быстрее, чем выбирать каждое слово отдельно.
+POOL_SIZE = 1 << 16
+WORDS = {
+    'ru': (
+        'заметка', 'список', 'покупки', 'встреча', 'проект', 'задача',
+        'молоко', 'хлеб', 'отпуск', 'книга', 'идея', 'план', 'неделя',
+        'работа', 'дом', 'семья', 'звонок', 'письмо', 'отчёт', 'код',
+        'сервер', 'база', 'данных', 'ёжик', 'южный', 'щавель', 'чай',
+        'утро', 'вечер', 'важно', 'срочно', 'потом', 'сделать', 'купить',
+    ),
+    'en': (
+        'note', 'list', 'shopping', 'meeting', 'project', 'task', 'milk',
+        'bread', 'holiday', 'book', 'idea', 'plan', 'week', 'work', 'home',
+        'family', 'call', 'letter', 'report', 'code', 'server', 'database',
+        'query', 'cache', 'morning', 'evening', 'urgent', 'later', 'todo',
+        'buy', 'review', 'release', 'deploy', 'fix',
+    ),
+}
+DISTRIBUTIONS = ('fixed', 'uniform', 'lognormal', 'pareto')
+
+
+class NoteGenerator:
+    """Детерминированный генератор заголовков и текстов заметок.
+
+    Длина текста в словах подчиняется распределению distribution со
+    средним mean_words; при одинаковом seed данные совпадают.
+    """
+
+    def __init__(self, seed=0, distribution='lognormal', mean_words=50):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f'Неизвестное распределение {distribution}.')
+        self.random = random.Random(seed)
+        self.distribution = distribution
+        self.mean_words = max(1, mean_words)
+        self.title_length = Note._meta.get_field('title').max_length
+        pool_size = max(POOL_SIZE, 2 * self.mean_words * MAX_WORDS_FACTOR)
+        self.pools = {
+            language: self.random.choices(words, k=pool_size)
+            for language, words in WORDS.items()
+        }
+        self.slugs = {
+            word: make_slug(word) for words in WORDS.values()
+            for word in words
+        }
+
+    def text_length(self):
+        mean = self.mean_words
+        if self.distribution == 'fixed':
+            length = mean
+        elif self.distribution == 'uniform':
+            length = self.random.randint(1, 2 * mean - 1)
+        elif self.distribution == 'lognormal':
+            length = self.random.lognormvariate(
+                math.log(mean) - LOGNORMAL_SIGMA ** 2 / 2, LOGNORMAL_SIGMA
+            )
+        else:
+            scale = mean * (PARETO_ALPHA - 1) / PARETO_ALPHA
+            length = scale * self.random.paretovariate(PARETO_ALPHA)
+        return min(max(1, round(length)), mean * MAX_WORDS_FACTOR)
+
+    def words(self, count):
+        """Слова одного языка: кириллица или латиница."""
+        pool = self.pools[self.random.choice(('ru', 'en'))]
+        start = self.random.randrange(len(pool) - count + 1)
+        return pool[start:start + count]
+
+    def title(self):
+        """Заголовок и его slug, как их построил бы Note.save().
+
+        Слова словаря состоят только из букв, поэтому slug заголовка
+        равен slug слов через дефис, посчитанных заранее.
+        """
+        words = self.words(self.random.randint(*TITLE_WORDS))
+        title = ' '.join(words).capitalize()
+        if len(title) > self.title_length:
+            title = title[:self.title_length]
+            return title, make_slug(title)
+        return title, '-'.join(map(self.slugs.__getitem__, words))
+
+    def text(self):
+        return ' '.join(self.words(self.text_length()))
+
+
+def create_users(count, prefix='user', password=None,
+                 batch_size=BATCH_SIZE):
+    """Пользователи prefix-1 ... prefix-N с одним общим паролем."""
+    # Хеш считается один раз: это самая медленная часть создания.
+    password = make_password(password)
+    return User.objects.bulk_create(
+        (
+            User(username=f'{prefix}-{number}', password=password)
+            for number in range(1, count + 1)
+        ),
+        batch_size=batch_size,
+    )
+
+
+def seed_notes(authors, count, generator, batch_size=BATCH_SIZE,
+               using='default'):
+    """Создаёт count заметок каждому автору пакетами executemany.
+
+    Строки вставляются напрямую, без экземпляров модели и компиляции
+    запроса ORM. Slug выделяются так же, как в Note.save(): из заголовка,
+    с суффиксами -2, -3, ... для занятых. Поисковый индекс и статистика
+    авторов дополняются один раз в конце.
+    """
+    connection = connections[using]
+    allocator = SlugAllocator(
+        Note.all_objects.using(using).values_list('slug', flat=True).iterator()
+    )
+    columns = (
+        'title', 'text', 'slug', 'author', 'updated_at', 'version', 'size'
+    )
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        connection.ops.quote_name(Note._meta.db_table),
+        ', '.join(
+            connection.ops.quote_name(Note._meta.get_field(name).column)
+            for name in columns
+        ),
+        ', '.join(['%s'] * len(columns)),
+    )
+    updated_at = Note._meta.get_field('updated_at').get_db_prep_save(
+        timezone.now(), connection
+    )
+    # Длинные тексты сжимаются так же, как при сохранении модели.
+    prepare_text = Note._meta.get_field('text').get_db_prep_save
+    rows = []
+    created = 0
+    author_ids = [author.pk for author in authors]
+    with deferred_index(using), transaction.atomic(using):
+        with connection.cursor() as cursor:
+            for author_id in author_ids:
+                for _ in range(count):
+                    title, slug = generator.title()
+                    text = generator.text()
+                    rows.append((
+                        title,
+                        prepare_text(text, connection),
+                        allocator.allocate(slug=slug),
+                        author_id,
+                        updated_at,
+                        1,
+                        text_size(text),
+                    ))
+                    if len(rows) == batch_size:
+                        cursor.executemany(sql, rows)
+                        created += len(rows)
+                        rows = []
+            cursor.executemany(sql, rows)
+        NoteStats.objects.using(using).rebuild(author_ids)
+    bump_versions(author_ids)
+    return created + len(rows)
@@ -0,0 +1,69 @@
+from functools import lru_cache
+
+from django.db.models import Q
+from pytils.translit import slugify
+
+SLUG_MAX_LENGTH = 100
+DEFAULT_SLUG = 'note'
+# Суффиксы до -99999: длина '-N' от 2 до 6 символов.
+SUFFIX_RESERVE = 6
+# Следующий за '9' символ: диапазон [stem-0, stem-:) - суффиксы из цифр.
+DIGITS_END = ':'
+
+
+@lru_cache(maxsize=4096)
+def make_slug(title, max_length=SLUG_MAX_LENGTH):
+    """Slug из заголовка; транслитерация частых заголовков кешируется."""
+    return slugify(title)[:max_length] or DEFAULT_SLUG
+
+
+def with_suffix(base, number, max_length=SLUG_MAX_LENGTH):
+    """Добавляет к slug суффикс -N, не выходя за max_length."""
+    suffix = f'-{number}'
+    return base[:max_length - len(suffix)] + suffix
+
+
+class SlugAllocator:
+    """Выделяет уникальные slug в памяти.
+
+    Занятые slug загружаются один раз, коллизии разрешаются суффиксами
+    -2, -3, ... без обращений к базе на каждую заметку.
+    """
+
+    def __init__(self, taken=(), max_length=SLUG_MAX_LENGTH):
+        self.taken = set(taken)
+        self.max_length = max_length
+        self._next_number = {}
+
+    def allocate(self, title='', slug=''):
+        base = slug[:self.max_length] or make_slug(title, self.max_length)
+        if base not in self.taken:
+            self.taken.add(base)
+            return base
+        number = self._next_number.get(base, 2)
+        candidate = with_suffix(base, number, self.max_length)
+        while candidate in self.taken:
+            number += 1
+            candidate = with_suffix(base, number, self.max_length)
+        self._next_number[base] = number + 1
+        self.taken.add(candidate)
+        return candidate
+
+
+def allocate_slug(queryset, title='', slug='', max_length=SLUG_MAX_LENGTH):
+    """Первый свободный slug вида base, base-2, base-3, ...
+
+    Занятые варианты выбираются одним запросом по диапазонам индекса
+    [stem-0, stem-:), а не LIKE, который индекс не использует. Диапазон
+    начинается с цифры, поэтому slug вида base-pro-1 в выборку не попадут.
+    """
+    base = slug[:max_length] or make_slug(title, max_length)
+    # Длинный base укорачивается под суффикс, как в with_suffix().
+    stems = {
+        base[:max_length - size] for size in range(2, SUFFIX_RESERVE + 1)
+    }
+    query = Q(slug=base)
+    for stem in stems:
+        query |= Q(slug__gte=f'{stem}-0', slug__lt=f'{stem}-{DIGITS_END}')
+    taken = queryset.filter(query).values_list('slug', flat=True)
+    return SlugAllocator(taken, max_length).allocate(slug=base)
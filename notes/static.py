@@ -0,0 +1,216 @@
+"""Статика с хешем в имени, сжатая заранее при collectstatic.
+
+CompressedManifestStaticFilesStorage кладёт рядом с каждым файлом
+с хешем его копии .gz и .br (brotli - если установлен пакет brotli).
+StaticFilesMiddleware отдаёт их без обращения к view: файлы с хешем
+кешируются навсегда, остальные - на NOTES_STATIC_MAX_AGE секунд.
+"""
+import gzip
+import mimetypes
+import os
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import (
+    ManifestStaticFilesStorage, staticfiles_storage,
+)
+from django.http import FileResponse
+from django.utils.safestring import mark_safe
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.map', '.txt', '.xml')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Порядок предпочтения: brotli сжимает текст лучше gzip.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+COMPRESSED_SUFFIXES = tuple(suffix for _, suffix in ENCODINGS)
+
+BOOTSTRAP = 'vendor/bootstrap/bootstrap.min.css'
+CRITICAL_CSS = 'css/critical.css'
+# Элементы первого экрана: base.html и includes/header.html.
+CRITICAL_ELEMENTS = frozenset((
+    'html', 'body', 'header', 'nav', 'div', 'a', 'span', 'b', 'strong',
+    'ul', 'li',
+))
+LICENSE_COMMENT = re.compile(r'/\*!.*?\*/', re.DOTALL)
+COMMENT = re.compile(r'/\*.*?\*/', re.DOTALL)
+PSEUDO = re.compile(r'::?[\w-]+(?:\([^)]*\))?')
+CLASS_NAME = re.compile(r'\.([\w-]+)')
+ELEMENT = re.compile(r'(?:^|[\s>+~])([a-z][\w-]*)')
+# Запятая списка селекторов, а не внутри :not(...).
+SELECTOR_SEPARATOR = re.compile(r',(?![^(]*\))')
+
+
+def compress(path):
+    """Пишет path.gz и path.br, если сжатие уменьшает файл."""
+    if not path.endswith(COMPRESSIBLE):
+        return
+    with open(path, 'rb') as source:
+        data = source.read()
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data, quality=11)))
+    for suffix, compressed in variants:
+        if len(compressed) < len(data):
+            with open(path + suffix, 'wb') as target:
+                target.write(compressed)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Манифест хешированных имён и сжатые копии файлов."""
+
+    def stored_name(self, name):
+        # Без collectstatic манифеста нет: в разработке и тестах файлы
+        # отдаются из исходных каталогов под своими именами.
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        # Промежуточные проходы пишут имена с другими хешами, сжимаются
+        # только итоговые из манифеста.
+        for name in set(self.hashed_files.values()):
+            compress(self.path(name))
+
+
+class StaticFile:
+    """Файл статики и его сжатые копии, найденные при запуске."""
+
+    def __init__(self, path, immutable):
+        self.path = path
+        self.content_type = (
+            mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        )
+        self.cache_control = IMMUTABLE if immutable else (
+            f'public, max-age={settings.NOTES_STATIC_MAX_AGE}'
+        )
+        self.encodings = [
+            (encoding, path + suffix) for encoding, suffix in ENCODINGS
+            if os.path.exists(path + suffix)
+        ]
+
+    def variant(self, accept_encoding):
+        accepted = {
+            part.split(';')[0].strip() for part in accept_encoding.split(',')
+            if not part.replace(' ', '').endswith(';q=0')
+        }
+        for encoding, path in self.encodings:
+            if encoding in accepted:
+                return encoding, path
+        return None, self.path
+
+
+def collect_files():
+    """{имя: StaticFile} из STATIC_ROOT или, до collectstatic, из finders."""
+    files = {}
+    storage = staticfiles_storage
+    if getattr(storage, 'hashed_files', None):
+        hashed = set(storage.hashed_files.values())
+        root = storage.location
+        for directory, _, names in os.walk(root):
+            for filename in names:
+                if filename.endswith(COMPRESSED_SUFFIXES):
+                    continue
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, root).replace(os.sep, '/')
+                files[name] = StaticFile(path, name in hashed)
+        return files
+    for finder in finders.get_finders():
+        for name, source in finder.list([]):
+            files.setdefault(
+                name.replace(os.sep, '/'),
+                StaticFile(source.path(name), immutable=False),
+            )
+    return files
+
+
+def serve(request, file):
+    encoding, path = file.variant(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    response = FileResponse(open(path, 'rb'), content_type=file.content_type)
+    # FileResponse подставляет имя файла, а у сжатой копии оно чужое.
+    del response['Content-Disposition']
+    if encoding:
+        response['Content-Encoding'] = encoding
+    if file.encodings:
+        response['Vary'] = 'Accept-Encoding'
+    response['Cache-Control'] = file.cache_control
+    response['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+
+def _rules(css):
+    """Пары (селектор или @-правило, тело) верхнего уровня."""
+    depth = start = 0
+    prelude = None
+    for index, char in enumerate(css):
+        if char == '{':
+            if depth == 0:
+                prelude, start = css[start:index].strip(), index + 1
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                yield prelude, css[start:index]
+                start = index + 1
+
+
+def _applies(selector, classes, elements):
+    """Селектор ссылается только на классы и элементы первого экрана."""
+    selector = PSEUDO.sub('', selector).strip()
+    if '[' in selector:
+        return False
+    return (
+        set(CLASS_NAME.findall(selector)) <= classes
+        and set(ELEMENT.findall(CLASS_NAME.sub('', selector))) <= elements
+    )
+
+
+def critical_css(css, classes, elements=CRITICAL_ELEMENTS):
+    """Правила css для классов classes и элементов первого экрана.
+
+    Из списка селекторов остаются подходящие, из @media - подходящие
+    правила; остальные @-правила отбрасываются. Комментарий лицензии
+    /*! ... */ сохраняется.
+    """
+    license_comment = LICENSE_COMMENT.match(css.lstrip())
+    result = [license_comment.group(0) + '\n'] if license_comment else []
+    for prelude, body in _rules(COMMENT.sub('', css)):
+        if prelude.startswith('@media'):
+            inner = critical_css(body, classes, elements)
+            if inner:
+                result.append(f'{prelude}{{{inner}}}')
+        elif not prelude.startswith('@'):
+            selectors = [
+                selector for selector in SELECTOR_SEPARATOR.split(prelude)
+                if _applies(selector, classes, elements)
+            ]
+            if selectors:
+                result.append(f'{",".join(selectors)}{{{body}}}')
+    return ''.join(result)
+
+
+@lru_cache(maxsize=None)
+def exists(name):
+    """Есть ли файл статики в исходных каталогах или в STATIC_ROOT."""
+    return (
+        finders.find(name) is not None or staticfiles_storage.exists(name)
+    )
+
+
+@lru_cache(maxsize=None)
+def inline(name):
+    """Содержимое файла статики для вставки в страницу."""
+    path = finders.find(name)
+    if path is None:
+        with staticfiles_storage.open(name) as source:
+            return mark_safe(source.read().decode())
+    with open(path, encoding='utf-8') as source:
+        return mark_safe(source.read())
@@ -0,0 +1,27 @@
+from django import template
+from django.conf import settings
+from django.templatetags.static import static
+
+from notes.static import BOOTSTRAP, CRITICAL_CSS, exists, inline
+
+register = template.Library()
+
+
+@register.simple_tag
+def inline_static(name):
+    """Вставляет файл статики в страницу, например критический CSS."""
+    return inline(name)
+
+
+@register.inclusion_tag('includes/stylesheets.html')
+def stylesheets():
+    """Bootstrap из своей статики, а пока он не скачан - с CDN."""
+    if not exists(BOOTSTRAP):
+        return {
+            'href': settings.NOTES_BOOTSTRAP_URL,
+            'integrity': settings.NOTES_BOOTSTRAP_INTEGRITY,
+        }
+    return {
+        'href': static(BOOTSTRAP),
+        'critical': inline(CRITICAL_CSS) if exists(CRITICAL_CSS) else '',
+    }
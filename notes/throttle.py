@@ -0,0 +1,188 @@
+"""Ограничение записи, общее для всех процессов сервера.
+
+Состояние лежит в файле, отображённом в память (mmap): корзины токенов
+по ключам user:<id> и ip:<адрес> и слоты одновременных писателей.
+Процессы сериализуются блокировкой файла flock, потоки одного процесса -
+обычной блокировкой. На пути запроса нет ни одного обращения к БД.
+
+Время в файле - time.time(), а не time.monotonic(): файл во временном
+каталоге переживает перезагрузку, а монотонные часы начинаются заново.
+"""
+import hashlib
+import mmap
+import os
+import threading
+import time
+from contextlib import contextmanager
+from struct import Struct
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Корзина: хеш ключа, остаток токенов, время последнего обновления.
+BUCKET = Struct('<Qdd')
+# Слот писателя: pid процесса и время начала запроса; pid 0 - свободен.
+WRITER = Struct('<qd')
+# Сколько соседних корзин просматривается при коллизии хешей.
+PROBES = 4
+
+
+def key_hash(key):
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    # 0 зарезервирован за пустой корзиной.
+    return int.from_bytes(digest, 'little') or 1
+
+
+class SharedState:
+    """Корзины токенов и слоты писателей в общем файле."""
+
+    def __init__(self, path, buckets, writers):
+        self.path = path
+        self.buckets = buckets
+        self.writers = writers
+        self.size = buckets * BUCKET.size + writers * WRITER.size
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self.fd).st_size < self.size:
+            os.ftruncate(self.fd, self.size)
+        self.map = mmap.mmap(self.fd, self.size)
+        self.lock = threading.Lock()
+
+    def close(self):
+        self.map.close()
+        os.close(self.fd)
+
+    @contextmanager
+    def locked(self):
+        # flock принадлежит открытому файлу, а не потоку, поэтому потоки
+        # одного процесса разделяет отдельная блокировка.
+        with self.lock:
+            if fcntl is not None:
+                fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def reset(self):
+        with self.locked():
+            self.map[:] = bytes(self.size)
+
+    def find_bucket(self, digest):
+        """Смещение корзины ключа или самой давней корзины из соседних."""
+        start = digest % self.buckets
+        oldest, oldest_at = None, None
+        for probe in range(PROBES):
+            offset = (start + probe) % self.buckets * BUCKET.size
+            stored, _, updated = BUCKET.unpack_from(self.map, offset)
+            if stored == digest:
+                return offset
+            if oldest is None or updated < oldest_at:
+                oldest, oldest_at = offset, updated
+        return oldest
+
+    def _refill(self, key, capacity, rate, now):
+        """Смещение корзины key, хеш ключа и токены на момент now."""
+        digest = key_hash(key)
+        offset = self.find_bucket(digest)
+        stored, tokens, updated = BUCKET.unpack_from(self.map, offset)
+        if stored != digest:
+            tokens, updated = capacity, now
+        # Часы могли уйти назад: пауза не бывает отрицательной.
+        elapsed = max(0.0, now - updated)
+        return offset, digest, min(capacity, tokens + elapsed * rate)
+
+    def take(self, limits):
+        """Берёт по токену из корзин; возвращает 0 или секунды ожидания.
+
+        limits - [(key, capacity, period)]: корзина вмещает capacity
+        токенов и заполняется за period секунд. Токены берутся, только
+        если их хватает во всех корзинах, иначе не тратится ни один.
+        """
+        now = time.time()
+        with self.locked():
+            buckets = []
+            for key, capacity, period in limits:
+                rate = capacity / period
+                buckets.append(
+                    (*self._refill(key, capacity, rate, now), rate)
+                )
+            wait = max((
+                (1 - tokens) / rate
+                for _, _, tokens, rate in buckets if tokens < 1
+            ), default=0)
+            for offset, digest, tokens, _ in buckets:
+                if not wait:
+                    tokens -= 1
+                BUCKET.pack_into(self.map, offset, digest, tokens, now)
+        return wait
+
+    def acquire_writer(self, limit, timeout):
+        """Занимает слот писателя; None, если заняты все limit слотов.
+
+        Слот старше timeout секунд считается брошенным: процесс мог
+        завершиться, не освободив его.
+        """
+        now = time.time()
+        token = (os.getpid(), now)
+        base = self.buckets * BUCKET.size
+        with self.locked():
+            for index in range(min(limit, self.writers)):
+                offset = base + index * WRITER.size
+                pid, started = WRITER.unpack_from(self.map, offset)
+                # Время из будущего - часы ушли назад, слот тоже брошен.
+                if pid == 0 or not 0 <= now - started <= timeout:
+                    WRITER.pack_into(self.map, offset, *token)
+                    return offset, token
+        return None
+
+    def release_writer(self, slot):
+        offset, token = slot
+        with self.locked():
+            # Брошенный слот мог уже занять другой писатель.
+            if WRITER.unpack_from(self.map, offset) == token:
+                WRITER.pack_into(self.map, offset, 0, 0.0)
+
+
+_state = None
+_state_lock = threading.Lock()
+
+
+def get_state():
+    """Состояние для текущих настроек; файл открывается один раз."""
+    global _state
+    config = (
+        settings.NOTES_THROTTLE_FILE,
+        settings.NOTES_THROTTLE_BUCKETS,
+        settings.NOTES_THROTTLE_MAX_WRITERS or 0,
+    )
+    with _state_lock:
+        if _state is None or (
+            (_state.path, _state.buckets, _state.writers) != config
+        ):
+            if _state is not None:
+                _state.close()
+            _state = SharedState(*config)
+        return _state
+
+
+def retry_after(request):
+    """Секунды до следующей разрешённой записи или 0.
+
+    Проверяются корзины пользователя и IP-адреса; None в настройке
+    отключает соответствующую корзину. Отказ одной корзины не тратит
+    токен другой.
+    """
+    keys = []
+    if request.user.is_authenticated:
+        keys.append((f'user:{request.user.pk}', settings.NOTES_THROTTLE_USER))
+    keys.append((f'ip:{request.META["REMOTE_ADDR"]}',
+                 settings.NOTES_THROTTLE_IP))
+    limits = [(key, *rate) for key, rate in keys if rate is not None]
+    if not limits:
+        return 0
+    return get_state().take(limits)
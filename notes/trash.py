@@ -0,0 +1,32 @@
+import time
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Note
+
+PURGE_BATCH_SIZE = 500
+
+
+def purge_trash(older_than, batch_size=PURGE_BATCH_SIZE, pause=0):
+    """Окончательно удаляет заметки, лежащие в корзине дольше older_than.
+
+    Каждая пачка удаляется в своей короткой транзакции, а между пачками
+    блокировка записи SQLite свободна для запросов пользователей.
+    Возвращает число удалённых заметок.
+    """
+    cutoff = timezone.now() - older_than
+    expired = Note.all_objects.filter(deleted_at__lt=cutoff)
+    total = 0
+    while True:
+        ids = list(
+            expired.order_by('deleted_at').values_list('pk', flat=True)
+            [:batch_size]
+        )
+        if not ids:
+            return total
+        # Условие повторяется при удалении: заметку могли восстановить
+        # после выборки.
+        with transaction.atomic():
+            total += expired.filter(pk__in=ids).purge()
+        time.sleep(pause)
@@ -1,6 +1,6 @@
 from django.urls import path
 
-from notes import views
+from notes import api, views
 
 app_name = 'notes'
 
@@ -9,7 +9,27 @@ urlpatterns = [
     path('add/', views.NoteCreate.as_view(), name='add'),
     path('edit/<slug:slug>/', views.NoteUpdate.as_view(), name='edit'),
     path('note/<slug:slug>/', views.NoteDetail.as_view(), name='detail'),
+    path(
+        'note/<slug:slug>/revisions/',
+        views.NoteRevisions.as_view(),
+        name='revisions',
+    ),
+    path(
+        'note/<slug:slug>/revisions/<int:number>/',
+        views.NoteRevisionRestore.as_view(),
+        name='revision',
+    ),
     path('delete/<slug:slug>/', views.NoteDelete.as_view(), name='delete'),
     path('notes/', views.NotesList.as_view(), name='list'),
+    path('trash/', views.NoteTrash.as_view(), name='trash'),
+    path('search/', views.NoteSearch.as_view(), name='search'),
+    path('export/', views.NoteExport.as_view(), name='export'),
     path('done/', views.NoteSuccess.as_view(), name='success'),
+    path('api/notes/', api.NoteListApi.as_view(), name='api_list'),
+    path(
+        'api/notes/<slug:slug>/',
+        api.NoteDetailApi.as_view(),
+        name='api_detail',
+    ),
+    path('api/batch/', api.NoteBatchApi.as_view(), name='api_batch'),
 ]
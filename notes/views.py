@@ -1,9 +1,61 @@
+import difflib
+import hashlib
+from http import HTTPStatus
+
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.conf import settings
+from django.db.models import Prefetch
+from django.http import (
+    Http404, HttpResponse, HttpResponseBadRequest, StreamingHttpResponse,
+)
+from django.middleware.csrf import get_token
+from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
 from django.views import generic
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from .cache import get_or_set, get_version
+from .export import FORMATS, iter_export
+from .forms import BulkActionForm, NoteForm
+from .metrics import registry
+from .models import Note, NoteStats, NoteTag, Tag, text_size
+from .pagination import KeysetPaginator
+from .revisions import revision_text, schedule_revision
+from .search import search_notes
+
+
+def _etag(request, *parts):
+    """Хеш для ETag; имя пользователя входит в него, так как есть в шапке.
+
+    CSRF-токен тоже: страница с формой и старым токеном после нового
+    входа дала бы 403 на отправку формы.
+    """
+    user = request.user
+    # get_token() создаёт cookie, если её ещё нет; в META - значение
+    # cookie, постоянное между запросами, в отличие от маски токена.
+    get_token(request)
+    csrf = request.META['CSRF_COOKIE']
+    value = ':'.join(map(str, (user.pk, user.username, csrf, *parts)))
+    return hashlib.md5(value.encode()).hexdigest()
+
+
+def notes_list_etag(request, *args, **kwargs):
+    """Версия данных автора меняется при любой записи, запрос к БД не нужен."""
+    return _etag(request, get_version(request.user.pk))
 
-from .forms import NoteForm
-from .models import Note
+
+def note_detail_etag(request, slug):
+    updated_at = Note.objects.filter(
+        author=request.user, slug=slug
+    ).values_list('updated_at', flat=True).first()
+    if updated_at is None:
+        return None
+    # Версия автора учитывает статистику заметок в шапке страницы.
+    return _etag(
+        request, slug, updated_at.isoformat(), get_version(request.user.pk)
+    )
 
 
 class Home(generic.TemplateView):
@@ -32,10 +84,21 @@ class NoteCreate(NoteBase, generic.CreateView):
     form_class = NoteForm
 
     def form_valid(self, form):
+        error = NoteStats.objects.quota_error(
+            self.request.user.pk,
+            count=1,
+            size=text_size(form.cleaned_data['text']),
+        )
+        if error:
+            form.add_error(None, error)
+            return self.form_invalid(form)
         new_note = form.save(commit=False)
         new_note.author = self.request.user
         new_note.save()
-        return super().form_valid(form)
+        form.save_tags()
+        # super().form_valid() сохранил бы заметку второй раз.
+        self.object = new_note
+        return redirect(self.get_success_url())
 
 
 class NoteUpdate(NoteBase, generic.UpdateView):
@@ -43,17 +106,295 @@ class NoteUpdate(NoteBase, generic.UpdateView):
     template_name = 'notes/form.html'
     form_class = NoteForm
 
+    def form_valid(self, form):
+        """Пишет только изменённые поля и только в прочитанную версию."""
+        changed = [
+            name for name in form.changed_data
+            if name not in ('version', 'tags')
+        ]
+        if 'text' in changed:
+            # Размер в self.object ещё прочитанный из базы.
+            error = NoteStats.objects.quota_error(
+                self.request.user.pk,
+                size=text_size(self.object.text) - self.object.size,
+            )
+            if error:
+                form.add_error(None, error)
+                return self.form_invalid(form)
+        version = form.cleaned_data['version'] or form.initial['version']
+        if changed and not self.object.save_changed(changed, version):
+            return self.conflict(form)
+        form.save_tags()
+        if {'title', 'text'} & set(changed):
+            schedule_revision(
+                self.object, (form.initial['title'], form.initial['text'])
+            )
+        return redirect(self.get_success_url())
+
+    def conflict(self, form):
+        """Страница слияния: сохранённая версия, правка и разница."""
+        current = get_object_or_404(self.get_queryset(), pk=self.object.pk)
+        submitted = {
+            name: form.cleaned_data[name] for name in form.Meta.fields
+        }
+        diff = difflib.unified_diff(
+            current.text.splitlines(), submitted['text'].splitlines(),
+            'Сохранённая версия', 'Ваша версия', lineterm='',
+        )
+        return self.response_class(
+            request=self.request,
+            template='notes/conflict.html',
+            context=self.get_context_data(
+                form=NoteForm(instance=current, initial={
+                    **submitted,
+                    'tags': form.cleaned_data['tags'],
+                    'version': current.version,
+                }),
+                current=current,
+                diff='\n'.join(diff),
+            ),
+            status=HTTPStatus.CONFLICT,
+        )
+
 
 class NoteDelete(NoteBase, generic.DeleteView):
-    """Удаление заметки."""
+    """Удаление заметки в корзину."""
     template_name = 'notes/delete.html'
 
+    def delete(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        self.get_queryset().filter(pk=self.object.pk).trash()
+        return redirect(self.get_success_url())
+
+
+class NoteTrash(NoteBase, generic.ListView):
+    """Корзина и действия над несколькими заметками сразу."""
+    template_name = 'notes/trash.html'
+    paginate_by = 50
 
+    def get_queryset(self):
+        return self.model.all_objects.filter(
+            author=self.request.user, deleted_at__isnull=False
+        ).only('id', 'slug', 'title', 'deleted_at').order_by('-deleted_at')
+
+    def get_context_data(self, **kwargs):
+        return super().get_context_data(
+            trash_days=settings.NOTES_TRASH_DAYS, **kwargs
+        )
+
+    def post(self, request, *args, **kwargs):
+        """Одно UPDATE или DELETE по отмеченным заметкам пользователя."""
+        form = BulkActionForm(request.POST)
+        if not form.is_valid():
+            return HttpResponseBadRequest()
+        action = form.cleaned_data['action']
+        notes = self.model.all_objects.filter(
+            author=request.user,
+            pk__in=form.cleaned_data['notes'],
+            # В корзину - только живые заметки, остальное - из корзины.
+            deleted_at__isnull=action == 'trash',
+        )
+        if form.cleaned_data['notes']:
+            getattr(notes, action)()
+        if action == 'trash':
+            return redirect('notes:list')
+        return redirect('notes:trash')
+
+
+@method_decorator(
+    (cache_control(private=True, no_cache=True),
+     condition(etag_func=notes_list_etag)),
+    name='get',
+)
 class NotesList(NoteBase, generic.ListView):
     """Список всех заметок пользователя."""
     template_name = 'notes/list.html'
+    paginate_by = 50
+
+    def get_tag(self):
+        """Метка из ?tag=; её id берётся из кеша вместе со страницей."""
+        name = self.request.GET.get('tag')
+        if not name:
+            return None
+        tags = get_or_set(self.request.user.pk, 'tags', self.get_tags)
+        for tag in tags:
+            if tag.name == name:
+                return tag
+        raise Http404('Метка не найдена.')
 
+    def get_tags(self):
+        """Метки для боковой панели: счётчики уже посчитаны."""
+        return list(Tag.objects.filter(
+            author=self.request.user, notes_count__gt=0
+        ).only('id', 'name', 'notes_count'))
 
+    def get_queryset(self):
+        """Для списка нужны только id, slug, заголовок и метки."""
+        queryset = super().get_queryset().only(
+            'id', 'slug', 'title'
+        ).prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.only('id', 'name'))
+        )
+        tag = self.get_tag()
+        if tag is not None:
+            # id заметок берутся из покрывающего индекса (tag, note), и
+            # заметки автора не перебираются целиком.
+            queryset = queryset.filter(id__in=NoteTag.objects.filter(
+                tag=tag.pk
+            ).values('note_id'))
+        return queryset
+
+    def paginate_queryset(self, queryset, page_size):
+        """Постраничный вывод по курсорам after/before вместо номера."""
+        paginator = KeysetPaginator(queryset, page_size)
+        after = paginator.parse_cursor(self.request.GET.get('after'))
+        before = paginator.parse_cursor(self.request.GET.get('before'))
+        # В ключе id метки: имя может содержать пробелы и не-ASCII
+        # символы, недопустимые в ключах memcached.
+        tag = self.get_tag()
+        tag_id = '' if tag is None else tag.pk
+        page = get_or_set(
+            self.request.user.pk,
+            f'list:{tag_id}:{after}:{before}:{page_size}',
+            lambda: paginator.get_page(after=after, before=before),
+        )
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        return super().get_context_data(
+            tags=get_or_set(self.request.user.pk, 'tags', self.get_tags),
+            tag=self.request.GET.get('tag', ''),
+            **kwargs,
+        )
+
+
+@method_decorator(
+    # Без Last-Modified: дата заметки не меняется от счётчиков в шапке,
+    # и If-Modified-Since отдавал бы 304 со старыми счётчиками.
+    (cache_control(private=True, no_cache=True),
+     condition(etag_func=note_detail_etag)),
+    name='get',
+)
 class NoteDetail(NoteBase, generic.DetailView):
     """Заметка подробно."""
     template_name = 'notes/detail.html'
+
+    def get_queryset(self):
+        return super().get_queryset().prefetch_related('tags')
+
+    def get_object(self, queryset=None):
+        get_object = super().get_object
+        return get_or_set(
+            self.request.user.pk,
+            f'detail:{self.kwargs[self.slug_url_kwarg]}',
+            lambda: get_object(queryset),
+        )
+
+
+class NoteRevisionBase(NoteBase):
+    """Версии одной заметки пользователя."""
+
+    def get_note(self):
+        if not hasattr(self, 'note'):
+            self.note = get_object_or_404(
+                super().get_queryset(), slug=self.kwargs['slug']
+            )
+        return self.note
+
+    def get_queryset(self):
+        return self.get_note().revisions.all()
+
+    def get_context_data(self, **kwargs):
+        return super().get_context_data(note=self.get_note(), **kwargs)
+
+
+class NoteRevisions(NoteRevisionBase, generic.ListView):
+    """История изменений заметки."""
+    template_name = 'notes/revisions.html'
+    paginate_by = 50
+
+    def get_queryset(self):
+        return super().get_queryset().defer('data')
+
+
+class NoteRevisionRestore(NoteRevisionBase, generic.DetailView):
+    """Просмотр версии заметки и её восстановление."""
+    template_name = 'notes/revision.html'
+    context_object_name = 'revision'
+    slug_field = 'number'
+    slug_url_kwarg = 'number'
+
+    def get_context_data(self, **kwargs):
+        return super().get_context_data(
+            text=revision_text(self.object), **kwargs
+        )
+
+    def post(self, request, *args, **kwargs):
+        revision = self.get_object()
+        note = self.get_note()
+        previous = (note.title, note.text)
+        note.title = revision.title
+        note.text = revision_text(revision)
+        note.save()
+        schedule_revision(note, previous)
+        return redirect(self.success_url)
+
+
+class NoteSearch(NoteBase, generic.TemplateView):
+    """Полнотекстовый поиск по заметкам пользователя."""
+    template_name = 'notes/search.html'
+    paginate_by = 20
+
+    def get_page_number(self):
+        try:
+            page = int(self.request.GET.get('page', 1))
+        except ValueError:
+            raise Http404('Некорректный номер страницы.')
+        if page < 1:
+            raise Http404('Некорректный номер страницы.')
+        return page
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get('q', '').strip()
+        page = self.get_page_number()
+        notes, has_next = search_notes(
+            self.request.user, query, page, self.paginate_by
+        )
+        context.update(
+            query=query,
+            object_list=notes,
+            page_number=page,
+            previous_page_number=page - 1,
+            next_page_number=page + 1 if has_next else None,
+        )
+        return context
+
+
+class NoteExport(NoteBase, generic.View):
+    """Выгрузка всех заметок пользователя в JSONL или ZIP с Markdown."""
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get('format', 'jsonl')
+        if export_format not in FORMATS:
+            raise Http404('Неизвестный формат выгрузки.')
+        content_type, filename = FORMATS[export_format]
+        response = StreamingHttpResponse(
+            iter_export(self.get_queryset(), export_format),
+            content_type=content_type,
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class Metrics(generic.View):
+    """Метрики процесса в формате Prometheus."""
+
+    def get(self, request, *args, **kwargs):
+        allowed = settings.METRICS_ALLOWED_IPS
+        if allowed and request.META.get('REMOTE_ADDR') not in allowed:
+            raise Http404
+        return HttpResponse(
+            registry.render_text(),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
@@ -1,3 +1,5 @@
+import os
+import tempfile
 from pathlib import Path
 
 from django.urls import reverse_lazy
@@ -22,11 +24,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым, чтобы в метрики попадали статика и время сжатия ответа.
+    'notes.middleware.MetricsMiddleware',
+    'notes.middleware.StaticFilesMiddleware',
+    'notes.middleware.GZipMiddleware',
+    'notes.middleware.PrimaryStickinessMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'notes.middleware.CachedAuthenticationMiddleware',
+    'notes.middleware.WriteThrottleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -37,13 +45,21 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Отступы HTML убираются при компиляции, cached.Loader
+            # компилирует каждый шаблон один раз на процесс.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'notes.loaders.FilesystemLoader',
+                    'notes.loaders.AppDirectoriesLoader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'notes.context_processors.note_stats',
             ],
         },
     },
@@ -59,6 +75,94 @@ DATABASES = {
     }
 }
 
+# Настроенный профиль SQLite: WAL, mmap и постоянные соединения.
+SQLITE_TUNED = os.getenv('YANOTE_SQLITE_TUNED', 'false').lower() == 'true'
+
+if SQLITE_TUNED:
+    DATABASES['default']['CONN_MAX_AGE'] = 600
+
+# Реплики для чтения: пути к файлам SQLite через запятую. Локально можно
+# указать тот же db.sqlite3 несколько раз - каждая реплика откроет его
+# отдельным соединением только для чтения.
+DATABASE_REPLICAS = []
+
+for number, path in enumerate(
+    filter(None, os.getenv('YANOTE_DB_REPLICAS', '').split(',')), start=1
+):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{path.strip()}?mode=ro',
+        'OPTIONS': {'uri': True},
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['notes.routers.PrimaryReplicaRouter']
+
+REPLICA_PIN_COOKIE = 'use_primary'
+REPLICA_PIN_SECONDS = 5
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Сессии и пользователи должны быть общими для всех процессов сервера,
+    # иначе выход и смена пароля видны только в одном из них. Файловый кеш
+    # общий на одной машине; на нескольких нужен memcached или redis.
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv(
+            'YANOTE_SHARED_CACHE_DIR',
+            os.path.join(tempfile.gettempdir(), 'yanote-cache'),
+        ),
+    },
+}
+
+NOTES_CACHE_TIMEOUT = 60 * 5
+
+# Сессии читаются из кеша, в БД идут только записи.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'shared'
+AUTHENTICATION_BACKENDS = ['django.contrib.auth.backends.ModelBackend']
+AUTH_USER_CACHE_ALIAS = 'shared'
+AUTH_USER_CACHE_TIMEOUT = 60
+
+# Бюджет запроса: сверх него MetricsMiddleware пишет предупреждение в лог.
+REQUEST_QUERY_BUDGET = 20
+REQUEST_LATENCY_BUDGET = 0.5
+METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
+
+NOTES_API_PAGE_SIZE = 100
+NOTES_API_BATCH_LIMIT = 500
+
+# Тексты заметок длиннее порога (в байтах) хранятся сжатыми; None - без
+# сжатия. zstd требует пакет zstandard.
+NOTES_TEXT_COMPRESS_THRESHOLD = 4096
+NOTES_TEXT_COMPRESSION = 'zlib'
+
+# История правок: полный текст каждые N версий, между ними - разницы.
+# С NOTES_REVISIONS_ASYNC версии записывает manage.py run_workers.
+NOTES_REVISION_SNAPSHOT_EVERY = 10
+NOTES_REVISIONS_ASYNC = True
+
+# Фоновые задачи: попыток до отказа, пауза перед первым повтором
+# (дальше удваивается) и сколько секунд задача занята одним воркером.
+NOTES_JOBS_MAX_ATTEMPTS = 5
+NOTES_JOBS_RETRY_DELAY = 10
+NOTES_JOBS_LEASE = 300
+
+# Markdown рендерится один раз на версию текста и хранится в кеше.
+NOTES_MARKDOWN_MAX_LENGTH = 200_000
+NOTES_MARKDOWN_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Заметки из корзины удаляются командой purge_trash через N дней.
+NOTES_TRASH_DAYS = 30
+
+# Квоты автора на заметки вне корзины; None - без ограничения.
+NOTES_QUOTA_NOTES = 100_000
+NOTES_QUOTA_BYTES = 512 * 1024 * 1024
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -82,8 +186,44 @@ USE_TZ = True
 
 
 STATIC_URL = '/static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+STATICFILES_DIRS = [BASE_DIR / 'static']
+# Имена с хешем содержимого и копии .gz/.br, созданные при collectstatic.
+STATICFILES_STORAGE = 'notes.static.CompressedManifestStaticFilesStorage'
+# Кеширование статики без хеша в имени, в секундах.
+NOTES_STATIC_MAX_AGE = 60 * 60
+# manage.py vendor_bootstrap скачивает этот файл в static/vendor и строит
+# из него css/critical.css; пока его нет, Bootstrap подключается с CDN.
+NOTES_BOOTSTRAP_URL = (
+    'https://cdn.jsdelivr.net/npm/bootstrap@5.0.1/dist/css/bootstrap.min.css'
+)
+NOTES_BOOTSTRAP_INTEGRITY = (
+    'sha384-+0n0xVW2eSR5OomGNYDnhzAbDsOXxcvSN1TPprVMTNDbiYZCxYbOOl7+AMvyTG2x'
+)
+
+# Ответы короче порога (в байтах) и уже сжатые форматы не сжимаются.
+NOTES_GZIP_MIN_LENGTH = 512
+NOTES_GZIP_SKIP_TYPES = ('application/zip', 'image/', 'font/woff')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('notes:home')
+
+# Ограничение записи: (токенов, за секунд) на пользователя и IP-адрес и
+# число одновременных писателей; None - без ограничения. Состояние общее
+# для процессов сервера и хранится в файле NOTES_THROTTLE_FILE.
+NOTES_THROTTLE_VIEWS = (
+    'notes:add', 'notes:edit', 'notes:delete', 'notes:trash',
+    'notes:revision', 'notes:api_list', 'notes:api_detail', 'notes:api_batch',
+    'users:signup',
+)
+NOTES_THROTTLE_USER = (30, 60)
+NOTES_THROTTLE_IP = (60, 60)
+NOTES_THROTTLE_MAX_WRITERS = 4
+NOTES_THROTTLE_WRITER_TIMEOUT = 30
+NOTES_THROTTLE_BUCKETS = 4096
+NOTES_THROTTLE_FILE = os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(),
+    'yanote-throttle',
+)